@@ -1,32 +1,136 @@
 """Basketball API client - mirrors JavaScript logic"""
-import requests
+import asyncio
 import logging
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from feed import decode_inplay, loads
+from metrics import API_ERRORS, span
 
 logger = logging.getLogger(__name__)
 
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """Shared keep-alive session, created on first use"""
+    global _session
+    if _session is None:
+        from config import HTTP_POOL_SIZE, ODDS_WORKERS
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                # Room for every hedged odds request plus the feed, so no keep-alive connection is discarded
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(HTTP_POOL_SIZE, ODDS_WORKERS + 1))
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+def warm_up():
+    """Open a pooled keep-alive connection to the API host before the first tick"""
+    from config import API_BASE_URL, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT
+    get_session().head(API_BASE_URL, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+
+def get_json(url, max_retries=None):
+    """GET a JSON document over the pooled session with bounded, jittered retries"""
+    return get_response(url, max_retries).json()
+
+def get_response(url, max_retries=None, budget=None):
+    """GET over the pooled session with bounded, jittered retries; the successful response
+
+    With a TickBudget, timeouts shrink to the time left and no retry is
+    started that could not finish before the deadline.
+    """
+    from config import HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP_MAX_RETRIES, HTTP_BACKOFF_BASE
+
+    if max_retries is None:
+        max_retries = HTTP_MAX_RETRIES
+
+    for attempt in range(max_retries + 1):
+        connect_timeout, read_timeout = HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT
+        if budget is not None:
+            connect_timeout = budget.timeout(connect_timeout, floor=0.5)
+            read_timeout = budget.timeout(read_timeout, floor=0.5)
+        try:
+            response = get_session().get(url, timeout=(connect_timeout, read_timeout))
+            response.raise_for_status()
+            return response
+        except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+            status = e.response.status_code if getattr(e, 'response', None) is not None else None
+            if attempt == max_retries or (status is not None and status not in RETRY_STATUSES):
+                raise
+            # Full jitter: sleep somewhere in [0, base * 2^attempt]
+            delay = random.uniform(0, HTTP_BACKOFF_BASE * (2 ** attempt))
+            if budget is not None and budget.timeout(delay + connect_timeout) < delay + connect_timeout:
+                raise   # no time left to back off and try again
+            logger.warning(f"HTTP attempt {attempt + 1} failed ({e}), retrying in {delay:.2f}s")
+            time.sleep(delay)
+
+async def get_json_async(url, max_retries=None):
+    """Awaitable get_json; concurrent calls share the same connection pool"""
+    return await asyncio.to_thread(get_json, url, max_retries)
+
 def fetch_games():
     """Fetch in-play games (mirrors JavaScript getEvents)"""
-    from config import API_TOKEN, SPORT_ID, LEAGUE_ID, API_VERSION
-    
+    from config import API_BASE_URL, API_TOKEN, SPORT_ID, LEAGUE_ID, API_VERSION
+
     try:
         if not API_TOKEN:
             logger.warning("No API token")
             return []
-        
-        url = f"https://api.b365api.com/{API_VERSION}/events/inplay?sport_id={SPORT_ID}&league_id={LEAGUE_ID}&token={API_TOKEN}"
+
+        url = f"{API_BASE_URL}/{API_VERSION}/events/inplay?sport_id={SPORT_ID}&league_id={LEAGUE_ID}&token={API_TOKEN}"
         logger.info(f"Fetching from: {url}")
-        
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        
+
+        with span("fetch"):
+            data = get_json(url)
+
         logger.info(f"API Response: success={data.get('success')}, results={len(data.get('results', []))}")
-        
+
         if data.get('success') != 1:
             logger.warning(f"API error: {data}")
+            API_ERRORS.inc(source="inplay")
             return []
-        
+
         return data.get('results', [])
     except Exception as e:
         logger.error(f"API fetch error: {e}")
+        API_ERRORS.inc(source="inplay")
         return []
+
+def fetch_snapshots(budget=None):
+    """Fetch in-play games decoded into GameSnapshot records, within budget if given"""
+    from config import API_BASE_URL, API_TOKEN, SPORT_ID, LEAGUE_ID, API_VERSION
+
+    try:
+        if not API_TOKEN:
+            logger.warning("No API token")
+            return []
+
+        url = f"{API_BASE_URL}/{API_VERSION}/events/inplay?sport_id={SPORT_ID}&league_id={LEAGUE_ID}&token={API_TOKEN}"
+
+        with span("fetch"):
+            body = get_response(url, budget=budget).content
+        with span("decode"):
+            data = loads(body)
+            if data.get('success') != 1:
+                logger.warning(f"API error: {data}")
+                API_ERRORS.inc(source="inplay")
+                return []
+            snapshots = decode_inplay(data)
+
+        logger.info(f"API Response: {len(data.get('results', []))} results, {len(snapshots)} usable")
+        return snapshots
+    except Exception as e:
+        logger.error(f"API fetch error: {e}")
+        API_ERRORS.inc(source="inplay")
+        return []
+
+async def fetch_games_async():
+    """Awaitable fetch_games, so several feed calls can run concurrently"""
+    return await asyncio.to_thread(fetch_games)
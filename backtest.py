@@ -0,0 +1,241 @@
+"""Historical replay and parameter sweep for GameProcessor
+
+Replays recorded games through GameProcessor.process_game with in-memory
+Firestore and Discord stand-ins, then scores the Q4 recommendations
+against each game's final total.
+
+    python backtest.py --csv 'samples/samples_*.csv' --lines lines.csv \\
+        --alert 3,5,7 --blend 0.2,0.3,0.4 --exp 1,1.5,2
+    python backtest.py --store ticks/ --lines lines.csv
+"""
+import argparse
+import csv
+import glob
+import itertools
+import json
+import logging
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+RECOMMENDATIONS = ("OVER", "UNDER", "NO BET")
+
+def _feed_game(event_id, home_name, away_name, quarter, minute, second, home_score, away_score):
+    """Game dict in the events/inplay shape GameProcessor expects"""
+    return {
+        "id": str(event_id),
+        "home": {"name": home_name},
+        "away": {"name": away_name},
+        "ss": f"{home_score}-{away_score}",
+        "timer": {"q": str(quarter), "tm": str(minute), "ts": str(second)},
+    }
+
+def load_sample_csv(path):
+    """Ticks from a main.js samples_<eventId>.csv file, grouped by event id"""
+    games = OrderedDict()
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            minute, second = row["timeRemaining"].split(":")
+            games.setdefault(row["eventId"], []).append(_feed_game(
+                row["eventId"], row["homeName"], row["awayName"], row["quarter"],
+                int(minute), int(second), row["homeScore"], row["awayScore"]))
+    return games
+
+def load_tick_store(path):
+    """Ticks from a tick_store.py directory, grouped by event id; team names are not stored"""
+    from tick_store import TickStore
+
+    store = TickStore(path)
+    games = OrderedDict()
+    for event_id in store.events():
+        cols = store.game(event_id)
+        minutes, seconds = cols["clock"] // 60, cols["clock"] % 60
+        games[str(event_id)] = [
+            _feed_game(event_id, "", "", q, m, s, home, away)
+            for q, m, s, home, away in zip(cols["quarter"].tolist(), minutes.tolist(), seconds.tolist(),
+                                           cols["home"].tolist(), cols["away"].tolist())]
+    return games
+
+def load_inplay_snapshots(path):
+    """Ticks from JSON lines, each a raw events/inplay response or its results list"""
+    games = OrderedDict()
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            snapshot = json.loads(line)
+            results = snapshot.get("results", []) if isinstance(snapshot, dict) else snapshot
+            for game in results:
+                if game.get("id") and game.get("ss") and game.get("timer"):
+                    games.setdefault(str(game["id"]), []).append(game)
+    return games
+
+def load_lines(path):
+    """{event id: total line} from a CSV with eventId,totalLine columns"""
+    with open(path, newline='') as f:
+        return {row["eventId"]: float(row["totalLine"]) for row in csv.DictReader(f) if row.get("totalLine")}
+
+def _final_total(ticks):
+    home, away = ticks[-1]["ss"].split("-")
+    return int(home) + int(away)
+
+def _grade(rec, line, final_total):
+    """'hit', 'miss', 'push' or None for NO BET"""
+    if rec not in ("OVER", "UNDER") or line is None:
+        return None
+    if final_total == line:
+        return "push"
+    won = final_total > line if rec == "OVER" else final_total < line
+    return "hit" if won else "miss"
+
+def _recommend(projection, line, threshold):
+    if line is None or projection is None:
+        return "NO BET"
+    diff = projection - line
+    if abs(diff) >= threshold:
+        return "OVER" if diff > 0 else "UNDER"
+    return "NO BET"
+
+def replay_game(event_id, ticks, line):
+    """Run one game through a fresh GameProcessor; decision-time projections or None
+
+    The alert threshold only decides the final OVER/UNDER comparison, so
+    callers score thresholds from the returned projection and margin.
+    """
+    from fakes import InMemoryFirestore, RecordingDiscord
+    from game_processor import GameProcessor
+    from game_state import GameStateManager
+
+    state_mgr = GameStateManager(None, db=InMemoryFirestore())
+    processor = GameProcessor(state_mgr, RecordingDiscord(), None)
+    odds_info = {"totalLine": line} if line is not None else None
+
+    for game in ticks:
+        processor.process_game(game, odds_info, "backtest")
+        state = state_mgr.get_state(event_id)
+        if state.get("betting_window_fired"):
+            home, away = game["ss"].split("-")
+            timer = game["timer"]
+            played = processor.engine.calculate_played_time(int(timer["q"]), int(timer["tm"]), int(timer["ts"]))
+            projection = state.get("betting_window_projection")
+            return {
+                "projection": projection,
+                "margin": None if line is None or projection is None else projection - line,
+                "raw": processor.engine.project_points(int(home) + int(away), played),
+            }
+    return None
+
+def evaluate_game(args):
+    """Worker: one replay of the game, scored for every parameter combination"""
+    event_id, ticks, line, alert_values, blend_values, exp_values = args
+    logging.getLogger().setLevel(logging.WARNING)
+    final_total = _final_total(ticks)
+    decision = replay_game(event_id, ticks, line)
+    outcomes = []
+    for alert_threshold in alert_values:
+        rec = "NO BET"
+        if decision and decision["margin"] is not None and abs(decision["margin"]) >= alert_threshold:
+            rec = "OVER" if decision["margin"] > 0 else "UNDER"
+        for blend_ratio, exp_threshold in itertools.product(blend_values, exp_values):
+            exp_rec = "NO BET"
+            if decision:
+                blended = round(decision["raw"] * blend_ratio + decision["projection"] * (1 - blend_ratio), 1)
+                exp_rec = _recommend(blended, line, exp_threshold)
+            outcomes.append({
+                "params": (alert_threshold, blend_ratio, exp_threshold),
+                "decided": decision is not None,
+                "rec": rec,
+                "rec_result": _grade(rec, line, final_total),
+                "exp_rec": exp_rec,
+                "exp_result": _grade(exp_rec, line, final_total),
+            })
+    return outcomes
+
+def _empty_tally():
+    return {
+        "games": 0, "decided": 0,
+        **{f"{kind}_{rec}": 0 for kind in ("rec", "exp") for rec in RECOMMENDATIONS},
+        **{f"{kind}_{result}": 0 for kind in ("rec", "exp") for result in ("hit", "miss", "push")},
+    }
+
+def run_sweep(games, lines, alert_values, blend_values, exp_values, workers=None):
+    """Replay all games for every parameter combination; tallies keyed by (alert, blend, exp)"""
+    tasks = [(event_id, ticks, lines.get(event_id), alert_values, blend_values, exp_values)
+             for event_id, ticks in games.items() if ticks]
+    tallies = OrderedDict((params, _empty_tally())
+                          for params in itertools.product(alert_values, blend_values, exp_values))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for outcomes in pool.map(evaluate_game, tasks, chunksize=max(1, len(tasks) // ((workers or os.cpu_count() or 1) * 4))):
+            for outcome in outcomes:
+                tally = tallies[outcome["params"]]
+                tally["games"] += 1
+                tally["decided"] += outcome["decided"]
+                tally[f"rec_{outcome['rec']}"] += 1
+                tally[f"exp_{outcome['exp_rec']}"] += 1
+                if outcome["rec_result"]:
+                    tally[f"rec_{outcome['rec_result']}"] += 1
+                if outcome["exp_result"]:
+                    tally[f"exp_{outcome['exp_result']}"] += 1
+    return tallies
+
+def _hit_rate(tally, kind):
+    graded = tally[f"{kind}_hit"] + tally[f"{kind}_miss"]
+    return tally[f"{kind}_hit"] / graded if graded else None
+
+def format_report(tallies):
+    """Plain-text table of recommendation counts and hit rates"""
+    lines = [f"{'alert':>6} {'blend':>6} {'exp':>5} | {'games':>5} {'OVER':>5} {'UNDER':>5} {'NOBET':>5} {'hit%':>6}"
+             f" | {'xOVER':>5} {'xUNDR':>5} {'xNOBT':>5} {'xhit%':>6}"]
+    for (alert, blend, exp), t in tallies.items():
+        rate = _hit_rate(t, "rec")
+        exp_rate = _hit_rate(t, "exp")
+        lines.append(
+            f"{alert:>6} {blend:>6} {exp:>5} | {t['games']:>5} {t['rec_OVER']:>5} {t['rec_UNDER']:>5} {t['rec_NO BET']:>5} "
+            f"{'-' if rate is None else f'{rate:.1%}':>6} | {t['exp_OVER']:>5} {t['exp_UNDER']:>5} {t['exp_NO BET']:>5} "
+            f"{'-' if exp_rate is None else f'{exp_rate:.1%}':>6}")
+    return "\n".join(lines)
+
+def _floats(text):
+    return [float(v) for v in text.split(",") if v]
+
+def main():
+    from projections import ProjectionEngine
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", action="append", default=[], help="samples_<eventId>.csv glob (repeatable)")
+    parser.add_argument("--snapshots", action="append", default=[], help="events/inplay JSON-lines glob (repeatable)")
+    parser.add_argument("--store", action="append", default=[], help="tick_store.py directory (repeatable)")
+    parser.add_argument("--lines", help="CSV with eventId,totalLine columns")
+    parser.add_argument("--alert", type=_floats, default=[ProjectionEngine.ALERT_THRESHOLD_POINTS])
+    parser.add_argument("--blend", type=_floats, default=[ProjectionEngine.BLEND_RATIO])
+    parser.add_argument("--exp", type=_floats, default=[ProjectionEngine.EXP_THRESHOLD])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--json", action="store_true", help="print tallies as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    games = OrderedDict()
+    for pattern in args.csv:
+        for path in sorted(glob.glob(pattern)):
+            games.update(load_sample_csv(path))
+    for pattern in args.snapshots:
+        for path in sorted(glob.glob(pattern)):
+            for event_id, ticks in load_inplay_snapshots(path).items():
+                games.setdefault(event_id, []).extend(ticks)
+    for path in args.store:
+        for event_id, ticks in load_tick_store(path).items():
+            games.setdefault(event_id, []).extend(ticks)
+    lines = load_lines(args.lines) if args.lines else {}
+
+    tallies = run_sweep(games, lines, args.alert, args.blend, args.exp, args.workers)
+    if args.json:
+        print(json.dumps([{"alert": a, "blend": b, "exp": e, **t} for (a, b, e), t in tallies.items()], indent=2))
+    else:
+        print(f"{len(games)} games, {sum(1 for g in games if g in lines)} with lines")
+        print(format_report(tallies))
+
+if __name__ == "__main__":
+    main()
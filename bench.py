@@ -0,0 +1,203 @@
+"""Micro-benchmarks for ProjectionEngine and the tick path
+
+    python bench.py                      # run and compare with bench_baseline.json
+    python bench.py --save               # run and store the results as the new baseline
+    python bench.py --quick --only engine
+
+Exits with status 1 if any benchmark is slower than the baseline by more
+than --threshold (default 20%).
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+import timeit
+
+SAMPLE_COUNTS = (10, 100, 1000, 10000)
+GAME_COUNTS = (1, 10, 100, 1000)
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+
+def synthetic_samples(count, seed=1):
+    """PPS series wandering around a typical league pace"""
+    rng = random.Random(seed)
+    value, samples = 0.16, []
+    for _ in range(count):
+        value = min(0.25, max(0.08, value + rng.uniform(-0.002, 0.002)))
+        samples.append(value)
+    return samples
+
+def synthetic_feed(game_count, tick, seed=7):
+    """events/inplay results for game_count games, tick*10 seconds into Q2"""
+    rng = random.Random(seed * 1000003 + tick)
+    games = []
+    elapsed = min(1200, 300 + tick * 10)             # tick 0 is the start of Q2
+    if elapsed == 1200:
+        quarter, remaining = 4, 0
+    else:
+        quarter, remaining = elapsed // 300 + 1, 300 - elapsed % 300
+    minute, second = divmod(remaining, 60)
+    for i in range(game_count):
+        pace = 0.14 + (i % 7) * 0.005
+        home = int(elapsed * pace / 2 + rng.randint(0, 2))
+        away = int(elapsed * pace / 2 + rng.randint(0, 2))
+        games.append({
+            "id": str(100000 + i),
+            "home": {"name": f"Home {i}"},
+            "away": {"name": f"Away {i}"},
+            "ss": f"{home}-{away}",
+            "timer": {"q": str(quarter), "tm": str(minute), "ts": str(second)},
+        })
+    return games
+
+def time_call(fn, quick=False):
+    """Best per-call time in seconds over a few autoranged repeats"""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    if quick:
+        number = max(1, number // 5)
+    return min(timer.repeat(repeat=3 if quick else 5, number=number)) / number
+
+def bench_engine(quick=False):
+    from projections import ProjectionEngine, SampleSeries
+
+    engine = ProjectionEngine()
+    results = {
+        "engine.calculate_pps": time_call(lambda: engine.calculate_pps(97, 845), quick),
+        "engine.project_full_game": time_call(lambda: engine.project_full_game(0.158), quick),
+        "engine.calculate_played_time": time_call(lambda: engine.calculate_played_time(3, 2, 41), quick),
+        "engine.calculate_played_time.ot": time_call(lambda: engine.calculate_played_time(6, 1, 5), quick),
+        "engine.project_points": time_call(lambda: engine.project_points(97, 845), quick),
+        "engine.calculate_team_totals": time_call(lambda: engine.calculate_team_totals(161.5, -4.5), quick),
+        "engine.calculate_team_totals.whole": time_call(lambda: engine.calculate_team_totals(160, 4), quick),
+    }
+    for count in SAMPLE_COUNTS[:3] if quick else SAMPLE_COUNTS:
+        samples = synthetic_samples(count)
+        series = SampleSeries(samples)
+        for name in ("analyze_momentum", "classify_pace_trend", "is_accelerating",
+                     "is_leader_on_fire", "project_points_from_samples"):
+            method = getattr(engine, name)
+            results[f"engine.{name}.list[{count}]"] = time_call(lambda: method(samples), quick)
+            results[f"engine.{name}.series[{count}]"] = time_call(lambda: method(series), quick)
+        results[f"series.append[{count}]"] = time_call(lambda: SampleSeries(samples), quick) / count
+
+    for count in GAME_COUNTS:
+        feed = synthetic_feed(count, 30)
+        columns = [[int(g["timer"][k]) for g in feed] for k in ("q", "tm", "ts")]
+        home = [int(g["ss"].split("-")[0]) for g in feed]
+        away = [int(g["ss"].split("-")[1]) for g in feed]
+        results[f"engine.project_batch[{count}]"] = time_call(
+            lambda: engine.project_batch(*columns, home, away), quick)
+    return results
+
+def _time_ticks(run_tick, ticks):
+    """Median seconds per tick"""
+    durations = []
+    for tick in range(ticks):
+        start = time.perf_counter()
+        run_tick(tick)
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+def bench_main(quick=False):
+    """main.process_tracked_games / process_tracked_slot_one with Discord stubbed"""
+    import main
+    import orjson
+    from fakes import RecordingDiscord
+    from feed import decode_inplay
+    from game_tracker import GameTracker
+
+    results = {}
+    ticks = 20 if quick else 60
+    for count in GAME_COUNTS:
+        body = orjson.dumps({"success": 1, "results": synthetic_feed(count, 30)})
+        results[f"feed.decode_inplay[{count}]"] = time_call(lambda: decode_inplay(body), quick)
+
+        feeds = [decode_inplay(synthetic_feed(count, tick)) for tick in range(ticks + 1)]
+        main.tracker = GameTracker(count)
+        discord = RecordingDiscord()
+        main.process_tracked_games(feeds[0], discord, None)   # select games
+        results[f"main.process_tracked_games[{count}]"] = _time_ticks(
+            lambda tick: main.process_tracked_games(feeds[tick + 1], discord, None), ticks)
+
+    feeds = [decode_inplay(synthetic_feed(1, tick)) for tick in range(ticks + 1)]
+    main.tracker = GameTracker(1)
+    main.tracker.select_new_games({snap.event_id: snap for snap in feeds[0]})
+    tracked = main.tracker.games[feeds[0][0].event_id]
+    results["main.process_tracked_slot_one"] = _time_ticks(
+        lambda tick: main.process_tracked_slot_one(feeds[tick + 1][0], tracked, RecordingDiscord(), None), ticks)
+    return results
+
+def bench_processor(quick=False):
+    """GameProcessor.process_games with in-memory Firestore and Discord"""
+    from fakes import InMemoryFirestore, RecordingDiscord
+    from game_processor import GameProcessor
+    from game_state import GameStateManager
+
+    results = {}
+    ticks = 10 if quick else 30
+    for count in GAME_COUNTS:
+        feeds = [synthetic_feed(count, tick) for tick in range(ticks)]
+        odds = {g["id"]: {"totalLine": 160.5} for g in feeds[0]}
+        # In-memory Firestore has no latency, so the pooled run shows the pool's overhead only
+        for label, workers in (("", 1), (".pool", None)):
+            processor = GameProcessor(GameStateManager(None, db=InMemoryFirestore()), RecordingDiscord(), None,
+                                      workers=workers)
+            results[f"processor.process_games{label}[{count}]"] = _time_ticks(
+                lambda tick: processor.process_games(feeds[tick], odds), ticks)
+    return results
+
+SUITES = {"engine": bench_engine, "main": bench_main, "processor": bench_processor}
+
+def compare(results, baseline, threshold):
+    """Report lines and the names of benchmarks slower than baseline by more than threshold"""
+    lines, regressions = [], []
+    for name, seconds in results.items():
+        base = baseline.get(name)
+        if base:
+            change = seconds / base - 1
+            flag = ""
+            if change > threshold:
+                flag = "  REGRESSION"
+                regressions.append(name)
+            lines.append(f"{name:<55} {seconds * 1e6:>12.2f} us  (baseline {base * 1e6:.2f} us, {change:+.1%}){flag}")
+        else:
+            lines.append(f"{name:<55} {seconds * 1e6:>12.2f} us  (no baseline)")
+    return lines, regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", choices=sorted(SUITES), action="append", help="run only these suites")
+    parser.add_argument("--quick", action="store_true", help="fewer repeats and sizes")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="store results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)   # per-game INFO/WARNING logs would dominate the timings
+    results = {}
+    for name in args.only or SUITES:
+        results.update(SUITES[name](args.quick))
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    lines, regressions = compare(results, baseline, args.threshold)
+    print("\n".join(lines))
+
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Saved {len(results)} results to {args.baseline}")
+    elif regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
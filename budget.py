@@ -0,0 +1,69 @@
+"""Per-tick time budget: critical work always runs, deferrable work is shed when time runs short"""
+import logging
+import threading
+import time
+from metrics import WORK_SHED
+
+logger = logging.getLogger(__name__)
+
+class TickBudget:
+    """Deadline for one tick plus a reserve kept back for critical work
+
+    Critical work (Q4 decisions, final reports) never asks. Deferrable
+    work (routine Q3 alerts, CSV/tick history, writes for unchanged games,
+    snapshots) calls allow(kind) first. Once less than `reserve` seconds
+    are left, allow() returns False and the shed is counted per kind.
+    Calls to external services use timeout() so none can run past the
+    deadline. seconds=None means no deadline.
+    """
+
+    def __init__(self, seconds=None, reserve=None, clock=time.monotonic):
+        from config import TICK_RESERVE_SECONDS
+
+        self.seconds = seconds
+        self.clock = clock
+        self.started = clock()
+        self.deadline = None if seconds is None else self.started + seconds
+        self.reserve = min(TICK_RESERVE_SECONDS if reserve is None else reserve, seconds or 0)
+        self.shed = {}       # kind -> work items dropped or postponed this tick
+        self._lock = threading.Lock()
+
+    def remaining(self):
+        """Seconds left, or None without a deadline"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - self.clock())
+
+    def expired(self):
+        return self.deadline is not None and self.clock() >= self.deadline
+
+    def allow(self, kind):
+        """True if deferrable work of this kind may run; counts it as shed otherwise"""
+        remaining = self.remaining()
+        if remaining is None or remaining > self.reserve:
+            return True
+        with self._lock:
+            self.shed[kind] = self.shed.get(kind, 0) + 1
+        WORK_SHED.inc(kind=kind)
+        return False
+
+    def timeout(self, cap, floor=0.0):
+        """Timeout for a blocking call: cap, cut down to the time left but not below floor"""
+        remaining = self.remaining()
+        if remaining is None:
+            return cap
+        return max(floor, min(cap, remaining))
+
+    def summary(self):
+        """Elapsed and remaining seconds plus shed counts, for logs and /tick"""
+        remaining = self.remaining()
+        return {
+            "elapsed": round(self.clock() - self.started, 3),
+            "remaining": None if remaining is None else round(remaining, 3),
+            "shed": dict(self.shed),
+        }
+
+    def report(self):
+        """Log a warning if anything was shed"""
+        if self.shed:
+            logger.warning(f"Tick budget ran short after {self.clock() - self.started:.1f}s, shed: {self.shed}")
@@ -6,6 +6,7 @@ API_TOKEN = os.getenv('API_TOKEN', '')
 SPORT_ID = '18'              # Basketball
 LEAGUE_ID = '25067'          # Your league
 API_VERSION = 'v3'           # Use v3 for in-play!
+API_BASE_URL = os.getenv('API_BASE_URL', 'https://api.b365api.com')   # b365 host, or a local fake (loadtest.py)
 
 # Google Cloud
 GCS_PROJECT = os.getenv('GCS_PROJECT', 'basketball-projections-python')
@@ -19,3 +20,64 @@ QUARTER_SECONDS = 300
 OT_SECONDS = 180
 GAME_SECONDS = 1200
 TIMEZONE = 'America/New_York'
+
+# Tracking
+MAX_TRACKED_GAMES = int(os.getenv('MAX_TRACKED_GAMES', '200'))
+
+# HTTP (b365 API)
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '3.05'))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '5'))
+HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '2'))
+HTTP_BACKOFF_BASE = float(os.getenv('HTTP_BACKOFF_BASE', '0.25'))   # seconds
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '10'))   # raised to ODDS_WORKERS + 1 if smaller
+
+# Odds
+ODDS_TTL_GAME_SECONDS = int(os.getenv('ODDS_TTL_GAME_SECONDS', '60'))   # game clock seconds
+ODDS_MAX_AGE = float(os.getenv('ODDS_MAX_AGE', '120'))                  # wall seconds
+ODDS_NEGATIVE_TTL = float(os.getenv('ODDS_NEGATIVE_TTL', '20'))         # wall seconds
+ODDS_DEADLINE = float(os.getenv('ODDS_DEADLINE', '6'))                  # wall seconds per lookup
+ODDS_WORKERS = int(os.getenv('ODDS_WORKERS', '16'))
+
+# State storage
+SAMPLE_DELTA_ENCODING = os.getenv('SAMPLE_DELTA_ENCODING', '') == '1'   # smaller docs, no zero-copy loads
+STATE_CACHE_SIZE = int(os.getenv('STATE_CACHE_SIZE', '1000'))              # games kept in memory
+STATE_CACHE_REVALIDATE = float(os.getenv('STATE_CACHE_REVALIDATE', '60'))   # seconds before re-checking Firestore
+
+# Parallel game processing (GameProcessor)
+PROCESS_WORKERS = int(os.getenv('PROCESS_WORKERS', '8'))             # 1 = process games one by one
+TICK_DEADLINE_SECONDS = float(os.getenv('TICK_DEADLINE_SECONDS', '20'))
+
+# Per-tick time budget (main /tick); stays well under gunicorn's --timeout 60
+TICK_BUDGET_SECONDS = float(os.getenv('TICK_BUDGET_SECONDS', '40'))
+TICK_RESERVE_SECONDS = float(os.getenv('TICK_RESERVE_SECONDS', '10'))   # kept back for decisions and finals
+
+# Built-in polling (instead of an external /tick cron)
+SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', '') == '1'
+POLL_FAST_SECONDS = float(os.getenv('POLL_FAST_SECONDS', '3'))       # Q4 decision window approaching
+POLL_NORMAL_SECONDS = float(os.getenv('POLL_NORMAL_SECONDS', '10'))  # a tracked game in Q3/Q4
+POLL_SLOW_SECONDS = float(os.getenv('POLL_SLOW_SECONDS', '30'))      # tracked games all in Q1/Q2
+POLL_IDLE_SECONDS = float(os.getenv('POLL_IDLE_SECONDS', '120'))     # nothing live
+POLL_JITTER = float(os.getenv('POLL_JITTER', '0.1'))                 # +/- fraction of the interval
+POLL_MAX_PER_MINUTE = int(os.getenv('POLL_MAX_PER_MINUTE', '30'))
+
+# Sharding games across workers/instances (leases in Firestore)
+SHARDING_ENABLED = os.getenv('SHARDING_ENABLED', '') == '1'
+# Leases are renewed by a heartbeat thread, independent of ticks; LEASE_TTL_SECONDS must be >= 3x HEARTBEAT_SECONDS
+LEASE_TTL_SECONDS = float(os.getenv('LEASE_TTL_SECONDS', '30'))   # a dead worker's games move after this
+HEARTBEAT_SECONDS = float(os.getenv('HEARTBEAT_SECONDS', '10'))   # lease renewal / ring refresh thread period
+SHARD_VNODES = int(os.getenv('SHARD_VNODES', '64'))
+
+# Tracked game expiry (lifecycle timing wheel)
+STALL_SECONDS = float(os.getenv('STALL_SECONDS', '240'))   # Q1/Q2 clock frozen this long -> release
+GONE_SECONDS = float(os.getenv('GONE_SECONDS', '180'))     # missing from the feed this long -> release
+
+# Tracker snapshots for fast restarts ('' = off, 'file' or 'gcs'), one per worker: <path or object>.<worker id>
+# 'file' under /tmp only survives worker restarts; Cloud Run instance recycles need 'gcs'
+SNAPSHOT_BACKEND = os.getenv('SNAPSHOT_BACKEND', '')
+SNAPSHOT_PATH = os.getenv('SNAPSHOT_PATH', '/tmp/tracker.snapshot')
+SNAPSHOT_OBJECT = os.getenv('SNAPSHOT_OBJECT', 'snapshots/tracker.snapshot')   # in GCS_BUCKET
+SNAPSHOT_SECONDS = float(os.getenv('SNAPSHOT_SECONDS', '30'))     # periodic save interval
+SNAPSHOT_MAX_AGE = float(os.getenv('SNAPSHOT_MAX_AGE', '600'))    # older snapshots are ignored
+
+# Columnar tick history (tick_store.py); '' = off
+TICK_STORE_PATH = os.getenv('TICK_STORE_PATH', '')
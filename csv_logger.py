@@ -1,35 +1,159 @@
 """CSV logging for projections"""
+import atexit
 import csv
+import gzip
 import logging
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
 from config import TIMEZONE
-import pytz
 
 logger = logging.getLogger(__name__)
 
+# Column layout of main.js samples_<eventId>.csv
+SAMPLE_CSV_HEADERS = [
+    "timestamp", "eventId", "homeName", "awayName", "quarter", "timeRemaining", "playedSeconds",
+    "homeScore", "awayScore", "totalScore", "homePPS", "awayPPS", "totalPPS",
+    "homeRaw", "homeAvg", "awayRaw", "awayAvg", "totalRaw", "totalAvg",
+    "homeSampleCount", "awaySampleCount", "totalSampleCount",
+]
+
 class CSVLogger:
-    def __init__(self, filename):
+    """Buffered CSV writer with cached file handles and size/per-game rotation
+
+    filename may contain "{game_id}" to write one file per game.
+    """
+
+    def __init__(self, filename, max_open_files=32, flush_rows=100, flush_interval=5.0,
+                 max_bytes=None, gzip_rotated=False):
+        import pytz
+
         self.filename = filename
         self.tz = pytz.timezone(TIMEZONE)
-    
-    def log_sample(self, row_data):
-        """Log projection sample to CSV"""
+        self.max_open_files = max_open_files
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.gzip_rotated = gzip_rotated
+        self._handles = OrderedDict()   # path -> (file, writer)
+        self._buffers = {}              # path -> rows waiting to be written
+        self._buffered = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def log_sample(self, row_data, game_id=None):
+        """Buffer a projection sample row; written on flush"""
         try:
-            with open(self.filename, 'a', newline='') as f:
-                writer = csv.DictWriter(f, fieldnames=row_data.keys())
-                writer.writerow(row_data)
+            with self._lock:
+                self._buffers.setdefault(self._path(game_id), []).append(row_data)
+                self._buffered += 1
+                if (self._buffered >= self.flush_rows
+                        or time.monotonic() - self._last_flush >= self.flush_interval):
+                    self._flush_locked()
             return True
         except Exception as e:
             logger.error(f"Error logging to CSV: {e}")
             return False
-    
-    def initialize_csv(self, headers):
-        """Initialize CSV with headers"""
+
+    def initialize_csv(self, headers, game_id=None):
+        """Start a fresh CSV with headers, rotating any existing file instead of truncating it"""
         try:
-            with open(self.filename, 'w', newline='') as f:
-                writer = csv.DictWriter(f, fieldnames=headers)
-                writer.writeheader()
+            with self._lock:
+                path = self._path(game_id)
+                self._flush_path(path)
+                self._close_handle(path)
+                if os.path.exists(path) and os.path.getsize(path) > 0:
+                    self._rotate(path)
+                with open(path, 'w', newline='') as f:
+                    writer = csv.DictWriter(f, fieldnames=headers)
+                    writer.writeheader()
             return True
         except Exception as e:
             logger.error(f"Error initializing CSV: {e}")
             return False
+
+    def flush(self):
+        """Write all buffered rows to disk"""
+        with self._lock:
+            self._flush_locked()
+
+    def close_game(self, game_id):
+        """Flush and close a finished game's file, gzipping it if configured"""
+        with self._lock:
+            path = self._path(game_id)
+            self._flush_path(path)
+            self._close_handle(path)
+            if self.gzip_rotated and os.path.exists(path):
+                self._gzip(path)
+
+    def close(self):
+        """Flush everything and close all handles"""
+        with self._lock:
+            self._flush_locked()
+            for path in list(self._handles):
+                self._close_handle(path)
+
+    def _path(self, game_id):
+        if "{game_id}" in self.filename:
+            return self.filename.format(game_id=game_id)
+        return self.filename
+
+    def _flush_locked(self):
+        for path in list(self._buffers):
+            self._flush_path(path)
+        self._buffered = 0
+        self._last_flush = time.monotonic()
+
+    def _flush_path(self, path):
+        rows = self._buffers.pop(path, None)
+        if not rows:
+            return
+        self._buffered -= len(rows)
+        try:
+            f, writer = self._handle(path, rows[0].keys())
+            writer.writerows(rows)
+            f.flush()
+            if self.max_bytes and f.tell() >= self.max_bytes:
+                self._close_handle(path)
+                self._rotate(path)
+        except Exception as e:
+            logger.error(f"Error flushing CSV {path}: {e}")
+
+    def _handle(self, path, fieldnames):
+        """Open (or reuse) an append handle, closing the least recently used beyond the limit"""
+        if path in self._handles:
+            self._handles.move_to_end(path)
+            return self._handles[path]
+
+        f = open(path, 'a', newline='')
+        writer = csv.DictWriter(f, fieldnames=list(fieldnames))
+        if f.tell() == 0:
+            writer.writeheader()
+        self._handles[path] = (f, writer)
+        while len(self._handles) > self.max_open_files:
+            oldest = next(iter(self._handles))
+            self._close_handle(oldest)
+        return f, writer
+
+    def _close_handle(self, path):
+        handle = self._handles.pop(path, None)
+        if handle:
+            handle[0].close()
+
+    def _rotate(self, path):
+        """Move a file aside as <name>.<timestamp><ext>, gzipped if configured"""
+        stem, ext = os.path.splitext(path)
+        rotated = f"{stem}.{datetime.now(self.tz).strftime('%Y%m%d-%H%M%S-%f')}{ext}"
+        os.replace(path, rotated)
+        logger.info(f"Rotated CSV {path} -> {rotated}")
+        if self.gzip_rotated:
+            self._gzip(rotated)
+
+    def _gzip(self, path):
+        with open(path, 'rb') as src, gzip.open(path + '.gz', 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(path)
@@ -1,79 +1,255 @@
 """Discord integration"""
+import bisect
+import itertools
+import queue
+from collections import deque
+import threading
+import time
 import requests
 import logging
+from metrics import API_ERRORS, span
 
 logger = logging.getLogger(__name__)
 
+# Lower number is sent first
+PRIORITY_DECISION = 0
+PRIORITY_FINAL = 1
+PRIORITY_ROUTINE = 2
+_PRIORITY_SHUTDOWN = 99
+
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+
+def _embed_chars(embed):
+    """Characters Discord counts against the per-message embed limit"""
+    chars = len(embed.get("title", "")) + len(embed.get("description", ""))
+    for field in embed.get("fields", []):
+        chars += len(field.get("name", "")) + len(field.get("value", ""))
+    return chars
+
+class DiscordDispatcher:
+    """Background webhook sender with a bounded priority queue, embed packing and 429 backoff"""
+    
+    def __init__(self, webhook_url, maxsize=500, max_attempts=5):
+        self.webhook_url = webhook_url
+        self.max_attempts = max_attempts
+        self.session = requests.Session()
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue = queue.PriorityQueue(maxsize)
+        self._seq = itertools.count()
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """Start the sender thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="discord-dispatcher", daemon=True)
+            self._thread.start()
+    
+    def submit(self, kind, body, priority=PRIORITY_ROUTINE):
+        """Queue a 'content' string or an 'embed' dict; False if the queue is full"""
+        try:
+            self._queue.put_nowait((priority, next(self._seq), kind, body))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(f"Discord queue full, dropped {kind} (priority {priority})")
+            return False
+    
+    def stop(self, timeout=10):
+        """Send everything already queued, then stop the sender thread; gives up after timeout seconds"""
+        if self._thread is None:
+            return
+        deadline = time.monotonic() + timeout
+        try:
+            self._queue.put((_PRIORITY_SHUTDOWN, next(self._seq), None, None), timeout=timeout)
+        except queue.Full:
+            logger.warning("Discord queue still full at shutdown, stopping after the current send")
+            self._stop.set()
+        self._thread.join(max(0, deadline - time.monotonic()))
+        self._thread = None
+    
+    def _run(self):
+        # Items taken off the queue but not sent yet, in (priority, seq) order. Only this
+        # thread consumes the queue, so they are never put back: a full queue would block it.
+        carry = deque()
+        while not self._stop.is_set():
+            priority, seq, kind, body = self._next(carry, block=True)
+            if kind is None:
+                return
+            if kind == "content":
+                self._post({"content": body})
+                continue
+            
+            embeds = [body]
+            chars = _embed_chars(body)
+            held = []
+            while len(embeds) < MAX_EMBEDS_PER_MESSAGE:
+                item = self._next(carry, block=False)
+                if item is None:
+                    break
+                if item[2] == "embed" and chars + _embed_chars(item[3]) <= MAX_EMBED_CHARS_PER_MESSAGE:
+                    embeds.append(item[3])
+                    chars += _embed_chars(item[3])
+                    continue
+                held.append(item)
+                if item[2] != "content":
+                    break
+            carry.extendleft(reversed(held))
+            self._post({"embeds": embeds})
+    
+    def _next(self, carry, block):
+        """Lowest (priority, seq) of the carry-over and the queue; None if both are empty and not block"""
+        if not carry:
+            if block:
+                return self._queue.get()
+            try:
+                return self._queue.get_nowait()
+            except queue.Empty:
+                return None
+        try:
+            item = self._queue.get_nowait()
+        except queue.Empty:
+            return carry.popleft()
+        if item[:2] < carry[0][:2]:
+            return item
+        carry.insert(bisect.bisect([x[:2] for x in carry], item[:2]), item)
+        return carry.popleft()
+    
+    def _post(self, payload):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                with span("discord"):
+                    response = self.session.post(self.webhook_url, json=payload, timeout=(3.05, 10))
+                if response.status_code == 429:
+                    retry_after = self._retry_after(response)
+                    logger.warning(f"Discord rate limited, retrying in {retry_after:.2f}s")
+                    time.sleep(retry_after)
+                    continue
+                response.raise_for_status()
+                self.sent += 1
+                logger.info(f"✅ Discord payload sent ({len(payload.get('embeds', [])) or 1} item(s))")
+                return True
+            except Exception as e:
+                logger.error(f"Discord dispatch error (attempt {attempt}): {e}")
+                time.sleep(min(2 ** attempt, 10) * 0.1)
+        self.failed += 1
+        API_ERRORS.inc(source="discord")
+        return False
+    
+    def _retry_after(self, response):
+        try:
+            return float(response.json().get("retry_after", 1))
+        except Exception:
+            return float(response.headers.get("Retry-After", 1))
+
 class DiscordClient:
     """Send messages to Discord"""
     
-    def __init__(self, webhook_url):
+    def __init__(self, webhook_url, dispatcher=None):
         self.webhook_url = webhook_url
+        self.dispatcher = dispatcher
+    
+    def start_dispatcher(self, maxsize=500):
+        """Send through a background DiscordDispatcher from now on"""
+        if self.webhook_url and self.dispatcher is None:
+            self.dispatcher = DiscordDispatcher(self.webhook_url, maxsize)
+            self.dispatcher.start()
+        return self.dispatcher
     
-    def send_message(self, message):
+    def stop_dispatcher(self, timeout=10):
+        """Flush and stop the background dispatcher, if any"""
+        if self.dispatcher:
+            self.dispatcher.stop(timeout)
+            self.dispatcher = None
+    
+    def warm_up(self):
+        """Open the webhook connection ahead of the first alert (GET returns the webhook's info)"""
+        if not self.webhook_url:
+            return
+        session = self.dispatcher.session if self.dispatcher else requests
+        session.get(self.webhook_url, timeout=(3.05, 10))
+    
+    def send_message(self, message, priority=PRIORITY_ROUTINE):
         """Send text message to Discord"""
         if not self.webhook_url:
             logger.warning("Discord webhook not configured")
             return False
         
+        if self.dispatcher:
+            return self.dispatcher.submit("content", message, priority)
+        
         try:
             payload = {"content": message}
-            response = requests.post(self.webhook_url, json=payload, timeout=10)
+            with span("discord"):
+                response = requests.post(self.webhook_url, json=payload, timeout=10)
             response.raise_for_status()
             logger.info("✅ Discord message sent")
             return True
         except Exception as e:
             logger.error(f"Discord error: {e}")
+            API_ERRORS.inc(source="discord")
             return False
     
-    def send_embed(self, title, description, fields=None):
+    def send_embed(self, title, description, fields=None, priority=PRIORITY_ROUTINE):
         """Send embed to Discord"""
         if not self.webhook_url:
             return False
         
+        embed = {
+            "title": title,
+            "description": description,
+            "color": 3447003
+        }
+        if fields:
+            embed["fields"] = fields
+        
+        if self.dispatcher:
+            return self.dispatcher.submit("embed", embed, priority)
+        
         try:
-            embed = {
-                "title": title,
-                "description": description,
-                "color": 3447003
-            }
-            if fields:
-                embed["fields"] = fields
-            
             payload = {"embeds": [embed]}
-            response = requests.post(self.webhook_url, json=payload, timeout=10)
+            with span("discord"):
+                response = requests.post(self.webhook_url, json=payload, timeout=10)
             response.raise_for_status()
             return True
         except Exception as e:
             logger.error(f"Discord embed error: {e}")
+            API_ERRORS.inc(source="discord")
             return False
 
 # --- The following function MUST be OUTSIDE the class! ---
 def build_game_embed(game, home_score, away_score, total_score, q, m, s,
                     home_raw, home_avg, away_raw, away_avg, total_raw, total_avg,
                     home_line, away_line, total_line,
-                    home_momentum, away_momentum, reliability, samples):
-    """Return a dict suitable for DiscordClient.send_embed()"""
+                    home_momentum, away_momentum, reliability, samples, recommendation=None):
+    """Return a dict suitable for DiscordClient.send_embed(); a None line shows as N/A"""
 
     quarter_label = f"Q{q}" if q <= 4 else f"OT{q-4}"
     time_str = f"{m}:{str(s).zfill(2)}"
     title = f"🏀 {game['home']['name']} vs. {game['away']['name']} | {quarter_label}, {time_str}"
     description = f"Score: {home_score}-{away_score} ({total_score})"
 
+    def line_str(line):
+        return "N/A" if line is None else line
+
+    total_diff = "N/A" if total_line is None else f"{total_avg - total_line:.1f}"
     fields = [
         {
             "name": f"{game['home']['name']} ({home_score})",
-            "value": f"Raw: {home_raw} | Avg: **{home_avg}**\nLine: **{home_line}**\nMomentum: {home_momentum}",
+            "value": f"Raw: {home_raw} | Avg: **{home_avg}**\nLine: **{line_str(home_line)}**\nMomentum: {home_momentum}",
             "inline": True
         },
         {
             "name": f"{game['away']['name']} ({away_score})",
-            "value": f"Raw: {away_raw} | Avg: **{away_avg}**\nLine: **{away_line}**\nMomentum: {away_momentum}",
+            "value": f"Raw: {away_raw} | Avg: **{away_avg}**\nLine: **{line_str(away_line)}**\nMomentum: {away_momentum}",
             "inline": True
         },
         {
             "name": "GAME TOTAL",
-            "value": f"Raw: {total_raw} | Avg: **{total_avg}**\nLine: **{total_line}** | Diff: **{total_avg - total_line:.1f}**",
+            "value": f"Raw: {total_raw} | Avg: **{total_avg}**\nLine: **{line_str(total_line)}** | Diff: **{total_diff}**",
             "inline": False
         },
         {
@@ -87,6 +263,8 @@ def build_game_embed(game, home_score, away_score, total_score, q, m, s,
             "inline": True
         }
     ]
+    if recommendation is not None:
+        fields.insert(3, {"name": "Rec", "value": f"**{recommendation}**", "inline": False})
 
     return {
         "title": title,
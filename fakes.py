@@ -0,0 +1,196 @@
+"""In-memory stand-ins for external services (Firestore, Discord), for local runs and replays"""
+import copy
+import itertools
+import threading
+import time
+from datetime import datetime, timezone, timedelta
+
+_EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+class WriteResult:
+    def __init__(self, update_time):
+        self.update_time = update_time
+
+class DocumentSnapshot:
+    def __init__(self, reference, data, update_time):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+        self.update_time = update_time
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+class DocumentReference:
+    def __init__(self, client, collection, doc_id):
+        self._client = client
+        self.collection_name = collection
+        self.id = doc_id
+
+    @property
+    def _key(self):
+        return (self.collection_name, self.id)
+
+    def get(self, retry=None, timeout=None):
+        return self._client._get(self._key, self)
+
+    def create(self, data):
+        return self._client._write([(self._key, "create", data, False)])[0]
+
+    def set(self, data, merge=False):
+        return self._client._write([(self._key, "set", data, merge)])[0]
+
+    def update(self, data, option=None):
+        return self._client._write([(self._key, "update", data, True)], option)[0]
+
+    def delete(self, option=None):
+        return self._client._write([(self._key, "delete", None, False)], option)[0]
+
+class CollectionReference:
+    def __init__(self, client, name):
+        self._client = client
+        self.name = name
+
+    def document(self, doc_id):
+        return DocumentReference(self._client, self.name, doc_id)
+
+    def stream(self):
+        return [DocumentReference(self._client, self.name, doc_id).get()
+                for (collection, doc_id) in self._client._keys() if collection == self.name]
+
+class LastUpdateOption:
+    def __init__(self, last_update_time):
+        self.last_update_time = last_update_time
+
+class WriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._ops = []
+
+    def set(self, reference, data, merge=False):
+        self._ops.append((reference._key, "set", data, merge))
+
+    def update(self, reference, data):
+        self._ops.append((reference._key, "update", data, True))
+
+    def delete(self, reference):
+        self._ops.append((reference._key, "delete", None, False))
+
+    def commit(self, retry=None, timeout=None):
+        return self._client._write(self._ops)
+
+class InMemoryFirestore:
+    """Thread-safe dict-backed subset of google.cloud.firestore.Client
+
+    Counts reads, writes and commits so callers can check how much
+    traffic a code path would send to real Firestore.
+    """
+
+    def __init__(self):
+        self._docs = {}      # (collection, id) -> (data, update_time)
+        self._lock = threading.Lock()
+        self._clock = itertools.count(1)
+        self.reads = 0
+        self.writes = 0
+        self.commits = 0
+
+    def collection(self, name):
+        return CollectionReference(self, name)
+
+    def batch(self):
+        return WriteBatch(self)
+
+    def write_option(self, last_update_time):
+        """Precondition for update/delete: the document is unchanged since last_update_time"""
+        return LastUpdateOption(last_update_time)
+
+    def _keys(self):
+        with self._lock:
+            return list(self._docs)
+
+    def _get(self, key, reference):
+        with self._lock:
+            self.reads += 1
+            data, update_time = self._docs.get(key, (None, None))
+            return DocumentSnapshot(reference, copy.deepcopy(data), update_time)
+
+    def _write(self, ops, option=None):
+        from google.api_core.exceptions import AlreadyExists, FailedPrecondition, NotFound
+        from google.cloud.firestore import DELETE_FIELD
+
+        with self._lock:
+            self.commits += 1
+            if option is not None:
+                # Single-document writes only, like the real preconditioned calls
+                key = ops[0][0]
+                current_time = self._docs.get(key, (None, None))[1]
+                if current_time is None and ops[0][1] == "update":
+                    raise NotFound(f"No document to update: {key}")
+                if current_time != option.last_update_time:
+                    raise FailedPrecondition(f"{key} changed since {option.last_update_time}")
+            results = []
+            for key, kind, data, merge in ops:
+                self.writes += 1
+                update_time = _EPOCH + timedelta(microseconds=next(self._clock))
+                if kind == "delete":
+                    self._docs.pop(key, None)
+                    results.append(WriteResult(update_time))
+                    continue
+                current = self._docs.get(key, (None, None))[0]
+                if kind == "update" and current is None:
+                    raise NotFound(f"No document to update: {key}")
+                if kind == "create" and current is not None:
+                    raise AlreadyExists(f"Document already exists: {key}")
+                doc = dict(current) if (merge and current) else {}
+                for field, value in data.items():
+                    if value is DELETE_FIELD:
+                        doc.pop(field, None)
+                    else:
+                        doc[field] = copy.deepcopy(value)
+                self._docs[key] = (doc, update_time)
+                results.append(WriteResult(update_time))
+            return results
+
+class RecordingDiscord:
+    """DiscordClient stand-in that keeps every message instead of posting it"""
+
+    def __init__(self):
+        self.messages = []   # (monotonic time, priority, payload)
+        self._lock = threading.Lock()
+
+    def send_message(self, message, priority=None):
+        with self._lock:
+            self.messages.append((time.monotonic(), priority, {"content": message}))
+        return True
+
+    def send_embed(self, title, description, fields=None, priority=None):
+        embed = {"title": title, "description": description}
+        if fields:
+            embed["fields"] = fields
+        with self._lock:
+            self.messages.append((time.monotonic(), priority, {"embeds": [embed]}))
+        return True
+
+class InMemorySnapshotBackend:
+    """snapshot.FileBackend/GCSBackend stand-in holding the last blob each worker wrote"""
+
+    def __init__(self, key='tracker', blobs=None):
+        self.key = key
+        self.blobs = {} if blobs is None else blobs   # share one dict between workers
+        self.reads = 0
+        self.writes = 0
+
+    def read_all(self):
+        self.reads += 1
+        return dict(self.blobs)
+
+    def write(self, data):
+        self.writes += 1
+        self.blobs[self.key] = bytes(data)
+
+    def delete(self, key):
+        self.blobs.pop(key, None)
@@ -0,0 +1,93 @@
+"""Inplay feed decoding into compact game snapshots"""
+import logging
+
+try:
+    import orjson as _json
+except ImportError:   # pragma: no cover - orjson is in requirements.txt
+    import json as _json
+
+logger = logging.getLogger(__name__)
+
+loads = _json.loads
+
+class GameSnapshot:
+    """One game's score and clock from a single inplay response"""
+
+    __slots__ = ("event_id", "home_name", "away_name", "quarter", "minute", "second",
+                 "home_score", "away_score", "fingerprint", "raw")
+
+    def __init__(self, event_id, home_name, away_name, quarter, minute, second,
+                 home_score, away_score, fingerprint, raw=None):
+        self.event_id = event_id
+        self.home_name = home_name
+        self.away_name = away_name
+        self.quarter = quarter
+        self.minute = minute
+        self.second = second
+        self.home_score = home_score
+        self.away_score = away_score
+        self.fingerprint = fingerprint
+        self.raw = raw    # the source dict, for code that still wants the API shape
+
+    @property
+    def total_score(self):
+        return self.home_score + self.away_score
+
+    @property
+    def stamp(self):
+        """Clock as "q-m-s", the format stored in last_timestamp/last_stamp"""
+        return f"{self.quarter}-{self.minute}-{self.second}"
+
+    def __repr__(self):
+        return (f"GameSnapshot({self.event_id}, Q{self.quarter} {self.minute}:{self.second:02}, "
+                f"{self.home_score}-{self.away_score})")
+
+def decode_game(game):
+    """GameSnapshot for one events/inplay result, or None if score or clock is unusable"""
+    event_id = game.get('id')
+    ss = game.get('ss')
+    timer = game.get('timer')
+    if not event_id or not ss or not timer:
+        logger.warning(f"Game {event_id} missing id/ss/timer")
+        return None
+
+    try:
+        q, tm, ts = timer['q'], timer['tm'], timer['ts']
+        home, _, away = ss.partition('-')
+        snapshot = GameSnapshot(
+            str(event_id),
+            (game.get('home') or {}).get('name', ''),
+            (game.get('away') or {}).get('name', ''),
+            int(q), int(tm), int(ts), int(home), int(away),
+            hash((ss, q, tm, ts)),
+            game,
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        logger.warning(f"Game {event_id} has invalid ss/timer ({ss!r}, {timer!r}): {e}")
+        return None
+    return snapshot
+
+def decode_inplay(payload):
+    """Snapshots from an events/inplay body (bytes/str), parsed response or results list"""
+    if isinstance(payload, (bytes, bytearray, memoryview, str)):
+        payload = loads(payload)
+    results = payload.get('results', []) if isinstance(payload, dict) else payload
+    snapshots = []
+    for game in results or ():
+        snapshot = decode_game(game)
+        if snapshot is not None:
+            snapshots.append(snapshot)
+    return snapshots
+
+def as_snapshot(game):
+    """Pass snapshots through, decode raw dicts"""
+    return game if isinstance(game, GameSnapshot) else decode_game(game)
+
+def changed_snapshots(snapshots, fingerprints):
+    """Snapshots whose score or clock moved since the last call; updates fingerprints in place"""
+    changed = []
+    for snapshot in snapshots:
+        if fingerprints.get(snapshot.event_id) != snapshot.fingerprint:
+            fingerprints[snapshot.event_id] = snapshot.fingerprint
+            changed.append(snapshot)
+    return changed
@@ -1,5 +1,4 @@
 """Firestore database operations"""
-from google.cloud import firestore
 import logging
 
 logger = logging.getLogger(__name__)
@@ -7,6 +6,7 @@ logger = logging.getLogger(__name__)
 class FirestoreManager:
     def __init__(self, project_id):
         try:
+            from google.cloud import firestore
             self.db = firestore.Client(project=project_id)
         except Exception as e:
             logger.error(f"Firestore error: {e}")
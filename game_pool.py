@@ -0,0 +1,71 @@
+"""Bounded worker pool that runs each game's work in order, one task at a time"""
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+from metrics import GAMES_TIMED_OUT
+
+logger = logging.getLogger(__name__)
+
+class KeyedWorkerPool:
+    """Thread pool where tasks sharing a key never overlap and run in submit order
+
+    Each key has its own queue drained by at most one worker, so a slow
+    game delays only its own later ticks while other games keep going.
+    """
+
+    def __init__(self, max_workers, name="games"):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._queues = {}    # key -> deque of (future, fn, args), present while a drainer runs
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, *args):
+        """Queue fn(*args) behind earlier tasks for key; a Future for its result"""
+        future = Future()
+        with self._lock:
+            queue = self._queues.get(key)
+            start = queue is None
+            if start:
+                queue = self._queues[key] = deque()
+            queue.append((future, fn, args))
+        if start:
+            self._executor.submit(self._drain, key)
+        return future
+
+    def run_all(self, tasks, deadline=None):
+        """Run (key, fn, *args) tasks and wait up to deadline seconds; (done, not_done) sets of keys
+
+        A task that fails only fails its own future. Tasks still queued at
+        the deadline are cancelled. Tasks already running finish in the
+        background.
+        """
+        futures = {self.submit(key, fn, *args): key for key, fn, *args in tasks}
+        done, not_done = wait(futures, timeout=deadline)
+        for future in done:
+            if not future.cancelled() and future.exception() is not None:
+                logger.error(f"Task for {futures[future]} failed: {future.exception()}")
+        if not_done:
+            cancelled = sum(1 for future in not_done if future.cancel())
+            GAMES_TIMED_OUT.inc(len(not_done))
+            logger.warning(f"Tick deadline hit: {len(not_done)} game(s) unfinished, {cancelled} cancelled before starting")
+        return {futures[future] for future in done}, {futures[future] for future in not_done}
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def _drain(self, key):
+        while True:
+            with self._lock:
+                queue = self._queues[key]
+                if not queue:
+                    del self._queues[key]
+                    return
+                future, fn, args = queue.popleft()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
@@ -2,37 +2,82 @@
 import logging
 from datetime import datetime, timezone, timedelta
 from projections import ProjectionEngine
-from game_state import GameStateManager
+from discord_client import PRIORITY_DECISION
+from feed import as_snapshot, changed_snapshots
+from game_pool import KeyedWorkerPool
+from budget import TickBudget
+from metrics import GAMES_SEEN, SAMPLES_APPENDED, ALERTS_SENT
 
 logger = logging.getLogger(__name__)
 
 class GameProcessor:
     """Process live games and calculate projections"""
     
-    def __init__(self, state_manager, discord_client, csv_logger):
+    def __init__(self, state_manager, discord_client, csv_logger, workers=None, deadline=None):
+        from config import PROCESS_WORKERS, TICK_DEADLINE_SECONDS
+        
         self.engine = ProjectionEngine()
         self.state_mgr = state_manager
         self.discord = discord_client
         self.csv = csv_logger
+        self.fingerprints = {}   # event id -> fingerprint of the last processed snapshot
+        workers = PROCESS_WORKERS if workers is None else workers
+        self.pool = KeyedWorkerPool(workers) if workers > 1 else None
+        self.deadline = TICK_DEADLINE_SECONDS if deadline is None else deadline
+    
+    def process_games(self, games, odds_by_id=None, slot=None, budget=None):
+        """Process every game of a tick whose score or clock changed, in one batch of state writes
+        
+        Q4 games (decisions, finals) go first. Without a budget the tick
+        gets the pool deadline.
+        """
+        odds_by_id = odds_by_id or {}
+        budget = budget or TickBudget(self.deadline)
+        snapshots = [snap for snap in map(as_snapshot, games) if snap is not None]
+        GAMES_SEEN.inc(len(snapshots))
+        
+        # Forget games that left the feed, then skip the ones that did not move
+        live_ids = {snap.event_id for snap in snapshots}
+        for event_id in self.fingerprints.keys() - live_ids:
+            del self.fingerprints[event_id]
+        changed = changed_snapshots(snapshots, self.fingerprints)
+        changed.sort(key=lambda snap: snap.quarter < 4)
+        
+        with self.state_mgr.batched(budget):
+            if self.pool is None:
+                for snap in changed:
+                    if snap.quarter < 4 and not budget.allow("game"):
+                        self.fingerprints.pop(snap.event_id, None)   # retry it next tick
+                        continue
+                    self.process_game(snap, odds_by_id.get(snap.event_id), slot, budget)
+            else:
+                # One game per worker at a time, ticks of the same game in order
+                _, not_done = self.pool.run_all(
+                    [(snap.event_id, self.process_game, snap, odds_by_id.get(snap.event_id), slot, budget)
+                     for snap in changed], budget.remaining())
+                for event_id in not_done:
+                    self.fingerprints.pop(event_id, None)   # cancelled or unfinished, retry it next tick
     
-    def process_game(self, game, odds_info, slot):
-        """Main game processing logic"""
-        event_id = game['id']
-        state = self.state_mgr.get_state(event_id)
+    def process_game(self, game, odds_info, slot, budget=None):
+        """Main game processing logic; game is a GameSnapshot or a raw events/inplay dict"""
+        snap = as_snapshot(game)
+        if snap is None:
+            return
+        budget = budget or TickBudget()
+        event_id = snap.event_id
+        state = self.state_mgr.get_state(event_id, budget)
         
         try:
-            # Parse game data
-            home_name = game['home']['name']
-            away_name = game['away']['name']
-            ss = game['ss'].split('-')
-            home_score = int(ss[0])
-            away_score = int(ss[1])
-            total_score = home_score + away_score
-            
-            quarter = int(game['timer']['q'])
-            minute = int(game['timer']['tm'])
-            second = int(game['timer']['ts'])
-            stamp = f"{quarter}-{minute}-{second}"
+            home_name = snap.home_name
+            away_name = snap.away_name
+            home_score = snap.home_score
+            away_score = snap.away_score
+            total_score = snap.total_score
+            
+            quarter = snap.quarter
+            minute = snap.minute
+            second = snap.second
+            stamp = snap.stamp
             
             logger.info(f"Processing {home_name} vs {away_name}: {home_score}-{away_score}, Q{quarter}")
             
@@ -47,14 +92,16 @@ class GameProcessor:
             if quarter == 1:
                 logger.info("Q1: Tracking only, no sampling yet")
                 state['last_timestamp'] = stamp
-                self.state_mgr.save_state(event_id, state)
+                if budget.allow("unchanged_write"):
+                    self.state_mgr.save_state(event_id, state)
                 return
             
             # Duplicate detection
             if state['last_timestamp'] == stamp and state['last_home_score'] == home_score and state['last_away_score'] == away_score:
                 logger.info("Duplicate data, skipping")
                 state['last_timestamp'] = stamp
-                self.state_mgr.save_state(event_id, state)
+                if budget.allow("unchanged_write"):
+                    self.state_mgr.save_state(event_id, state)
                 return
             
             # Calculate played time and PPS
@@ -71,13 +118,14 @@ class GameProcessor:
             state['home_samples'].append(home_pps)
             state['away_samples'].append(away_pps)
             state['total_samples'].append(total_pps)
+            SAMPLES_APPENDED.inc()
             
             logger.info(f"Samples: Home={len(state['home_samples'])}, Away={len(state['away_samples'])}, Total={len(state['total_samples'])}")
             
             # Calculate projections
-            home_avg = round(sum(state['home_samples']) / len(state['home_samples']) * self.engine.GAME_SECONDS, 1)
-            away_avg = round(sum(state['away_samples']) / len(state['away_samples']) * self.engine.GAME_SECONDS, 1)
-            total_avg = round(sum(state['total_samples']) / len(state['total_samples']) * self.engine.GAME_SECONDS, 1)
+            home_avg = round(state['home_samples'].total / len(state['home_samples']) * self.engine.GAME_SECONDS, 1)
+            away_avg = round(state['away_samples'].total / len(state['away_samples']) * self.engine.GAME_SECONDS, 1)
+            total_avg = round(state['total_samples'].total / len(state['total_samples']) * self.engine.GAME_SECONDS, 1)
             
             # Momentum analysis
             home_momentum = self.engine.analyze_momentum(state['home_samples'])
@@ -85,6 +133,19 @@ class GameProcessor:
             
             logger.info(f"Projections - Home: {home_avg}, Away: {away_avg}, Total: {total_avg}")
             
+            # Every projection model from the same samples, side by side
+            series = (state['home_samples'], state['away_samples'], state['total_samples'])
+            models = self.engine.evaluate_models(
+                [home_pps, away_pps, total_pps],
+                [x.total / len(x) for x in series],
+                [x.ewma for x in series])
+            state['model_projections'] = {name: dict(zip(("home", "away", "total"), values.tolist()))
+                                          for name, values in models.items()}
+            
+            if self.csv and budget.allow("csv"):
+                self._log_sample(event_id, home_name, away_name, quarter, minute, second, played,
+                                 home_score, away_score, total_score, home_pps, away_pps, total_pps, state)
+            
             # Q4 Betting Decision Window
             if quarter == 4 and not state['betting_window_fired']:
                 logger.info("🎯 BETTING DECISION WINDOW TRIGGERED")
@@ -103,13 +164,16 @@ class GameProcessor:
                 else:
                     state['betting_window_recommendation'] = "NO BET"
                 
+                self._set_experimental(state, odds_info)
+                
                 # Send alert
                 self._send_betting_alert(home_name, away_name, home_score, away_score, total_score, total_avg, odds_info, state, quarter, minute, second)
+                self._send_experimental_alert(home_name, away_name, state)
                 self.state_mgr.save_state(event_id, state)
                 return
             
             # Q3+ Alerts (pre-decision)
-            if quarter >= 3 and not state['decision_window_complete']:
+            if quarter >= 3 and not state['decision_window_complete'] and budget.allow("alert"):
                 logger.info(f"Q{quarter}: Sending projection alert")
                 self._send_projection_alert(home_name, away_name, home_score, away_score, total_score, total_avg, home_avg, away_avg, home_momentum, away_momentum, odds_info, state, quarter, minute, second)
             
@@ -135,7 +199,8 @@ Q{q}, {m}:{str(s).zfill(2)} | 📊 {total_score} ({home_score}-{away_score})
 💰 **GAME TOTAL**: Avg **{total_avg}** | Line **{line}** | Rec: **{rec}**"""
         
         if self.discord:
-            self.discord.send_message(message)
+            self.discord.send_message(message, priority=PRIORITY_DECISION)
+            ALERTS_SENT.inc(kind="decision")
     
     def _send_projection_alert(self, home_name, away_name, home_score, away_score, total_score, total_avg, home_avg, away_avg, home_momentum, away_momentum, odds_info, state, q, m, s):
         """Send projection alert to Discord"""
@@ -154,6 +219,77 @@ Q{q}, {m}:{str(s).zfill(2)} | 📊 {total_score} ({home_score}-{away_score})
         
         if self.discord:
             self.discord.send_message(message)
+            ALERTS_SENT.inc(kind="projection")
+    
+    def _set_experimental(self, state, odds_info):
+        """main.js experimental* fields: blended-model projections and picks at the decision window"""
+        blended = state['model_projections'].get('blended', {})
+        total_line = odds_info.get('totalLine') if odds_info else None
+        home_line = away_line = None
+        if total_line is not None and odds_info.get('spread') is not None:
+            team_totals = self.engine.calculate_team_totals(total_line, odds_info['spread'])
+            if odds_info['spread'] < 0:
+                home_line, away_line = team_totals['high'], team_totals['low']
+            else:
+                home_line, away_line = team_totals['low'], team_totals['high']
+        
+        for side, line in (('total', total_line), ('home', home_line), ('away', away_line)):
+            projection = blended.get(side)
+            rec = "NO BET"
+            if projection is not None and line is not None:
+                diff = projection - line
+                if abs(diff) >= self.engine.EXP_THRESHOLD:
+                    rec = "OVER" if diff > 0 else "UNDER"
+            state[f'experimental_blended_{side}'] = projection
+            state[f'experimental_{side}_line'] = line
+            state[f'experimental_{side}_rec'] = rec
+    
+    def _send_experimental_alert(self, home_name, away_name, state):
+        """Send the blended-model picks to Discord"""
+        lines = []
+        for side, label in (('total', "TOTAL"), ('home', home_name), ('away', away_name)):
+            line = state[f'experimental_{side}_line']
+            rec = state[f'experimental_{side}_rec']
+            bet = f"{rec} {line}" if rec != "NO BET" else rec
+            lines.append(f"**{label}:** Blend {state[f'experimental_blended_{side}']} | Line {line if line is not None else 'N/A'} | 🎯 **BET {bet}**")
+        
+        message = f"""⏰ **{self._get_edt_time()}**
+
+🧪 **EXPERIMENTAL BLENDED PROJECTION** (⚠️ Beta)
+
+""" + "\n\n".join(lines)
+        
+        if self.discord:
+            self.discord.send_message(message)
+            ALERTS_SENT.inc(kind="experimental")
+    
+    def _log_sample(self, event_id, home_name, away_name, q, m, s, played, home_score, away_score, total_score, home_pps, away_pps, total_pps, state):
+        """Append a row in the main.js samples_<eventId>.csv layout"""
+        g = self.engine.GAME_SECONDS
+        self.csv.log_sample({
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "eventId": event_id,
+            "homeName": home_name,
+            "awayName": away_name,
+            "quarter": q,
+            "timeRemaining": f"{m}:{s}",
+            "playedSeconds": played,
+            "homeScore": home_score,
+            "awayScore": away_score,
+            "totalScore": total_score,
+            "homePPS": f"{home_pps:.6f}",
+            "awayPPS": f"{away_pps:.6f}",
+            "totalPPS": f"{total_pps:.6f}",
+            "homeRaw": round(home_pps * g, 4),
+            "homeAvg": round(state['home_samples'].total / len(state['home_samples']) * g, 4),
+            "awayRaw": round(away_pps * g, 4),
+            "awayAvg": round(state['away_samples'].total / len(state['away_samples']) * g, 4),
+            "totalRaw": round(total_pps * g, 4),
+            "totalAvg": round(state['total_samples'].total / len(state['total_samples']) * g, 4),
+            "homeSampleCount": len(state['home_samples']),
+            "awaySampleCount": len(state['away_samples']),
+            "totalSampleCount": len(state['total_samples']),
+        }, game_id=event_id)
     
     def _format_momentum(self, momentum):
         """Format momentum for Discord"""
@@ -1,53 +1,311 @@
 """Game state management"""
-from google.cloud import firestore
 import logging
 import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from projections import SampleSeries
+from sample_codec import encode_samples, decode_samples
+from metrics import API_ERRORS, span
 
 logger = logging.getLogger(__name__)
 
+SAMPLE_FIELDS = ("home_samples", "away_samples", "total_samples")
+BINARY_SUFFIX = "_bin"    # stored as packed bytes under e.g. home_samples_bin
+MAX_BATCH_WRITES = 500   # Firestore limit per batch commit
+BATCH_COMMIT_TIMEOUT = 10.0   # seconds, cut down to the tick budget when there is one
+STATE_READ_TIMEOUT = 5.0      # seconds per document read, likewise
+
+class TrackedState(dict):
+    """Game state dict that records which fields changed since the last save"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dirty = set()
+        self.saved_lengths = {}   # sample field -> number of samples already stored
+        self.legacy_fields = set()  # sample fields still stored as Firestore arrays
+
+    def __setitem__(self, key, value):
+        if key not in self or self[key] != value:
+            self.dirty.add(key)
+        super().__setitem__(key, value)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def changes(self):
+        """Fields to write: dirty scalars plus sample series that grew, packed to bytes"""
+        from config import SAMPLE_DELTA_ENCODING
+        from google.cloud.firestore import DELETE_FIELD
+
+        fields = {key: self[key] for key in self.dirty if key not in SAMPLE_FIELDS}
+        for field in SAMPLE_FIELDS:
+            series = self.get(field)
+            if series is None:
+                continue
+            if field in self.dirty or len(series) != self.saved_lengths.get(field, 0):
+                fields[field + BINARY_SUFFIX] = encode_samples(series.samples, SAMPLE_DELTA_ENCODING)
+                if field in self.legacy_fields:
+                    fields[field] = DELETE_FIELD
+        return fields
+
+    def has_unsaved(self):
+        """True if changes() would return anything"""
+        if self.dirty:
+            return True
+        return any(field in self and len(self[field]) != self.saved_lengths.get(field, 0)
+                   for field in SAMPLE_FIELDS)
+
+    def mark_saved(self):
+        """Forget pending changes after they were handed to Firestore"""
+        self.dirty.clear()
+        self.legacy_fields.clear()
+        for field in SAMPLE_FIELDS:
+            if field in self:
+                self.saved_lengths[field] = len(self[field])
+
 class GameStateManager:
-    """Manages game state in Firestore"""
-    
-    def __init__(self, project_id):
-        try:
-            self.db = firestore.Client(project=project_id)
-        except Exception as e:
-            logger.error(f"Firestore init error: {e}")
-            self.db = None
-    
-    def get_state(self, game_id):
-        """Get game state from Firestore"""
+    """Manages game state in Firestore behind a read-through/write-through LRU cache"""
+
+    def __init__(self, project_id, db=None, cache_size=None):
+        from config import STATE_CACHE_SIZE
+
+        if db is not None:
+            self.db = db
+        else:
+            try:
+                from google.cloud import firestore
+                self.db = firestore.Client(project=project_id)
+            except Exception as e:
+                logger.error(f"Firestore init error: {e}")
+                self.db = None
+        self._pending = None      # game id -> fields, while a batch is open
+        self._lock = threading.Lock()
+        self.cache_size = STATE_CACHE_SIZE if cache_size is None else cache_size
+        self._cache = OrderedDict()   # game id -> [state, update_time, last checked]
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_stale = 0
+        self.cache_evictions = 0
+
+    def get_state(self, game_id, budget=None):
+        """Get game state from the cache, falling back to Firestore
+
+        The read is bounded by STATE_READ_TIMEOUT, cut down to a TickBudget
+        if given; on timeout or error the cached (or a fresh) state is used.
+        """
+        from config import STATE_CACHE_REVALIDATE
+
+        with self._lock:
+            entry = self._cache.get(game_id)
+            if entry is not None:
+                self._cache.move_to_end(game_id)
+                if time.monotonic() - entry[2] < STATE_CACHE_REVALIDATE:
+                    self.cache_hits += 1
+                    return entry[0]
+
         if not self.db:
-            return self._default_state(game_id)
-        
+            state = entry[0] if entry else self._default_state(game_id)
+            self._remember(game_id, state, None)
+            return state
+
         try:
-            doc = self.db.collection('game_states').document(game_id).get()
-            if doc.exists:
-                return doc.to_dict()
+            with span("firestore"):
+                timeout = STATE_READ_TIMEOUT if budget is None else budget.timeout(STATE_READ_TIMEOUT, floor=0.5)
+                # One attempt: the client's default retry would run past the timeout
+                doc = self.db.collection('game_states').document(game_id).get(retry=None, timeout=timeout)
         except Exception as e:
             logger.error(f"Get state error: {e}")
-        
-        return self._default_state(game_id)
-    
+            API_ERRORS.inc(source="firestore")
+            return entry[0] if entry else self._default_state(game_id)
+
+        if entry is not None and doc.update_time == entry[1]:
+            # Nobody else wrote since our last read/write; keep the cached object
+            with self._lock:
+                self.cache_hits += 1
+            self._remember(game_id, entry[0], entry[1])
+            return entry[0]
+
+        with self._lock:
+            if entry is not None:
+                self.cache_stale += 1
+            else:
+                self.cache_misses += 1
+        if entry is not None:
+            logger.warning(f"State for {game_id} was changed by another writer, reloading")
+
+        state = self._load_samples(doc.to_dict()) if doc.exists else self._default_state(game_id)
+        self._remember(game_id, state, doc.update_time if doc.exists else None)
+        return state
+
+    def evict(self, game_id):
+        """Drop a game from the cache"""
+        with self._lock:
+            self._cache.pop(game_id, None)
+
+    def cache_stats(self):
+        """Cache hit/miss counters"""
+        with self._lock:
+            return {
+                "size": len(self._cache),
+                "hits": self.cache_hits,
+                "misses": self.cache_misses,
+                "stale": self.cache_stale,
+                "evictions": self.cache_evictions,
+            }
+
+    def _remember(self, game_id, state, update_time):
+        with self._lock:
+            self._cache[game_id] = [state, update_time, time.monotonic()]
+            self._cache.move_to_end(game_id)
+            self._evict_overflow()
+
+    def _record_write(self, game_id, update_time):
+        """Our own write's update time, so revalidation does not flag it as stale"""
+        with self._lock:
+            entry = self._cache.get(game_id)
+            if entry is not None:
+                entry[1] = update_time
+                entry[2] = time.monotonic()
+
+    def _evict_overflow(self):
+        """LRU eviction, finished games first; never drops unsaved changes"""
+        while len(self._cache) > self.cache_size:
+            victim = None
+            for game_id, (state, _, _) in self._cache.items():
+                if state.get('final_report_sent') and not self._unsaved(state):
+                    victim = game_id
+                    break
+            if victim is None:
+                victim = next((game_id for game_id, (state, _, _) in self._cache.items()
+                               if not self._unsaved(state)), None)
+            if victim is None:
+                return
+            del self._cache[victim]
+            self.cache_evictions += 1
+
+    def _unsaved(self, state):
+        return isinstance(state, TrackedState) and state.has_unsaved()
+
     def save_state(self, game_id, state):
-        """Save game state to Firestore"""
+        """Save changed fields to Firestore, or stage them if a batch is open"""
         if not self.db:
             return False
-        
+
+        fields = state.changes() if isinstance(state, TrackedState) else self._dump_samples(state)
+        if not fields:
+            return True
+
+        with self._lock:
+            if self._pending is not None:
+                self._pending.setdefault(game_id, {}).update(fields)
+                if isinstance(state, TrackedState):
+                    state.mark_saved()
+                return True
+
         try:
-            self.db.collection('game_states').document(game_id).set(state, merge=True)
+            with span("firestore"):
+                result = self.db.collection('game_states').document(game_id).set(fields, merge=True)
+            if isinstance(state, TrackedState):
+                state.mark_saved()
+            self._record_write(game_id, getattr(result, 'update_time', None))
             return True
         except Exception as e:
             logger.error(f"Save state error: {e}")
+            API_ERRORS.inc(source="firestore")
+            return False
+
+    def begin_batch(self):
+        """Stage save_state calls until commit_batch"""
+        with self._lock:
+            if self._pending is None:
+                self._pending = {}
+
+    def commit_batch(self, timeout=None):
+        """Write all staged changes in as few batch commits as possible"""
+        with self._lock:
+            pending, self._pending = self._pending, None
+        if not pending or not self.db:
+            return True
+
+        items = list(pending.items())
+        try:
+            for start in range(0, len(items), MAX_BATCH_WRITES):
+                chunk = items[start:start + MAX_BATCH_WRITES]
+                batch = self.db.batch()
+                for game_id, fields in chunk:
+                    batch.set(self.db.collection('game_states').document(game_id), fields, merge=True)
+                with span("firestore"):
+                    results = batch.commit(timeout=timeout)
+                for (game_id, _), result in zip(chunk, results or []):
+                    self._record_write(game_id, getattr(result, 'update_time', None))
+            logger.info(f"Committed state for {len(items)} games")
+            return True
+        except Exception as e:
+            logger.error(f"Batch commit error: {e}")
+            API_ERRORS.inc(source="firestore")
+            self._requeue(pending)
             return False
-    
+
+    @contextmanager
+    def batched(self, budget=None):
+        """Coalesce every save_state in the block into one batch commit, bounded by a TickBudget if given"""
+        self.begin_batch()
+        try:
+            yield self
+        finally:
+            self.commit_batch(None if budget is None else budget.timeout(BATCH_COMMIT_TIMEOUT, floor=1.0))
+
+    def _requeue(self, pending):
+        """Keep failed changes so the next commit retries them; newer values win"""
+        with self._lock:
+            if self._pending is None:
+                self._pending = {}
+            for game_id, fields in pending.items():
+                merged = dict(fields)
+                merged.update(self._pending.get(game_id, {}))
+                self._pending[game_id] = merged
+
+    def _load_samples(self, state):
+        """Wrap stored samples in SampleSeries accumulators, migrating legacy arrays"""
+        state = TrackedState(state)
+        legacy = set()
+        for field in SAMPLE_FIELDS:
+            blob = state.pop(field + BINARY_SUFFIX, None)
+            if blob is not None:
+                series = SampleSeries.from_buffer(decode_samples(blob))
+            else:
+                series = SampleSeries(state.get(field))
+                if field in state:
+                    legacy.add(field)
+            dict.__setitem__(state, field, series)
+        state.mark_saved()
+        for field in legacy:
+            # Rewrite once as packed bytes and drop the old array field
+            state.saved_lengths[field] = -1
+            state.legacy_fields.add(field)
+        return state
+
+    def _dump_samples(self, state):
+        """Copy of state with SampleSeries packed to bytes"""
+        from config import SAMPLE_DELTA_ENCODING
+
+        doc = dict(state)
+        for field in SAMPLE_FIELDS:
+            if isinstance(doc.get(field), SampleSeries):
+                doc[field + BINARY_SUFFIX] = encode_samples(doc.pop(field).samples, SAMPLE_DELTA_ENCODING)
+        return doc
+
     def _default_state(self, game_id):
         """Default game state"""
-        return {
+        state = TrackedState()
+        state.update({
             "game_id": game_id,
-            "home_samples": [],
-            "away_samples": [],
-            "total_samples": [],
+            "home_samples": SampleSeries(),
+            "away_samples": SampleSeries(),
+            "total_samples": SampleSeries(),
             "missed_cycles": 0,
             "silent_mode": True,
             "pace_history": "",
@@ -70,6 +328,16 @@ class GameStateManager:
             "home_team_rec": None,
             "away_team_projection": None,
             "away_team_line": None,
-            "away_team_rec": None
-        }
-
+            "away_team_rec": None,
+            "model_projections": {},
+            "experimental_blended_total": None,
+            "experimental_blended_home": None,
+            "experimental_blended_away": None,
+            "experimental_total_line": None,
+            "experimental_home_line": None,
+            "experimental_away_line": None,
+            "experimental_total_rec": None,
+            "experimental_home_rec": None,
+            "experimental_away_rec": None
+        })
+        return state
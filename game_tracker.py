@@ -0,0 +1,176 @@
+"""Multi-game tracking slots"""
+import logging
+import time
+from lifecycle import RESERVED, SAMPLING, ALERTING, STALLED, GONE, TERMINAL, TimingWheel, transition
+from projections import SampleSeries
+
+logger = logging.getLogger(__name__)
+
+# Phases in which a frozen Q1/Q2 clock releases the game
+STALLABLE = (RESERVED, SAMPLING)
+# Alert bookkeeping stored on shard leases, so a worker taking over a game does not repeat alerts
+SHARED_PROGRESS = ("phase", "betting_window_fired", "decision_complete", "final_report_sent", "last_alert")
+
+class GameTracker:
+    """Follows up to max_games live games, indexed by event id
+
+    With a ShardCoordinator, only games this worker holds a lease on are
+    tracked, so several workers or instances can share the feed.
+
+    Each game moves through the lifecycle phases. Two timers per game sit
+    on a timing wheel: "stall" while in Q1/Q2, pushed back whenever the
+    clock moves, and "gone", pushed back whenever the game is in the feed.
+    expire() releases whichever games' timers ran out.
+    """
+
+    def __init__(self, max_games, shard=None, stall_seconds=None, gone_seconds=None, clock=time.monotonic):
+        from config import STALL_SECONDS, GONE_SECONDS
+
+        self.max_games = max_games
+        self.games = {}      # event id -> per-game tracking state
+        self.shard = shard
+        self.stall_seconds = STALL_SECONDS if stall_seconds is None else stall_seconds
+        self.gone_seconds = GONE_SECONDS if gone_seconds is None else gone_seconds
+        self.clock = clock
+        self.timers = TimingWheel(now=clock())   # (event id, "stall" | "gone") -> deadline
+        self.stalled = {}    # event id -> fingerprint it stalled on, not re-selected until it changes
+
+    def __len__(self):
+        return len(self.games)
+
+    def __contains__(self, event_id):
+        return event_id in self.games
+
+    def get(self, event_id):
+        """Get tracking state for a game, or None"""
+        return self.games.get(event_id)
+
+    def has_capacity(self):
+        """True while another game can be tracked"""
+        return len(self.games) < self.max_games
+
+    def select_new_games(self, live_games):
+        """Start tracking Q1/Q2 games from the {event id: GameSnapshot} index until full"""
+        self.stalled = {event_id: fingerprint for event_id, fingerprint in self.stalled.items()
+                        if event_id in live_games and live_games[event_id].fingerprint == fingerprint}
+        if not self.has_capacity():
+            return []
+
+        candidates = [event_id for event_id, snap in live_games.items()
+                      if event_id not in self.games and event_id not in self.stalled
+                      and (snap.quarter in (1, 2) or (self.shard and self.shard.is_orphaned(event_id)))]
+        if self.shard:
+            candidates = self.shard.claim(candidates, limit=self.max_games - len(self.games))
+
+        picked = candidates[:self.max_games - len(self.games)]
+        now = self.clock()
+        for event_id in picked:
+            self.games[event_id] = self._new_state(event_id)
+            if self.shard and event_id in self.shard.inherited:
+                self.games[event_id].update(self.shard.inherited.pop(event_id))
+                logger.info(f"Took over game {event_id} from another worker")
+            if live_games[event_id].quarter <= 2 and self.games[event_id]["phase"] in STALLABLE:
+                self.timers.schedule((event_id, "stall"), now + self.stall_seconds)
+            self.timers.schedule((event_id, "gone"), now + self.gone_seconds)
+            logger.info(f"Now tracking game: {event_id}")
+        return picked
+
+    def restore(self, games):
+        """Adopt {event id: tracking state} from a snapshot; the event ids taken back"""
+        candidates = [event_id for event_id, tracked in games.items()
+                      if event_id not in self.games and tracked.get("phase") not in TERMINAL]
+        if self.shard:
+            candidates = self.shard.claim(candidates, limit=self.max_games - len(self.games))
+        restored = candidates[:max(0, self.max_games - len(self.games))]
+        now = self.clock()
+        for event_id in restored:
+            self.games[event_id] = {**self._new_state(event_id), **games[event_id]}
+            if self.games[event_id]["phase"] in STALLABLE:   # Q3/Q4 games must not stall out in a break
+                self.timers.schedule((event_id, "stall"), now + self.stall_seconds)
+            self.timers.schedule((event_id, "gone"), now + self.gone_seconds)
+        return restored
+
+    def observe(self, event_id, snap, clock_moved):
+        """A tracked game is in this tick's feed; advance its phase and push back its timers"""
+        tracked = self.games[event_id]
+        now = self.clock()
+        self.timers.schedule((event_id, "gone"), now + self.gone_seconds)
+        if snap.quarter > 2:
+            self.timers.cancel((event_id, "stall"))   # only a Q1/Q2 clock can stall
+        if not clock_moved:
+            return
+        if snap.quarter <= 2:
+            transition(tracked, SAMPLING)
+            self.timers.schedule((event_id, "stall"), now + self.stall_seconds)
+        elif tracked["phase"] in STALLABLE:
+            transition(tracked, ALERTING)
+
+    def set_phase(self, event_id, phase):
+        """Move a tracked game to phase, e.g. DECIDED or FINAL"""
+        tracked = self.games.get(event_id)
+        return tracked is not None and transition(tracked, phase)
+
+    def expire(self):
+        """Release games whose stall or gone timer ran out; [(event id, phase, tracking state)]"""
+        expired = []
+        for event_id, reason in self.timers.advance(self.clock()):
+            tracked = self.games.get(event_id)
+            if tracked is None or tracked["phase"] in TERMINAL:
+                continue
+            phase = STALLED if reason == "stall" else GONE
+            if not transition(tracked, phase):
+                continue   # e.g. an alerting game in a long stoppage keeps its slot
+            if phase == STALLED:
+                self.stalled[event_id] = tracked["fingerprint"]
+            self.release(event_id)
+            expired.append((event_id, phase, tracked))
+        return expired
+
+    def sync_shard(self):
+        """Publish progress to the shard's leases and drop games whose lease another worker took over"""
+        if self.shard is None:
+            return
+        progress = {event_id: {k: tracked[k] for k in SHARED_PROGRESS}
+                    for event_id, tracked in self.games.items()}
+        self.shard.publish(progress)
+        for event_id in self.shard.take_lost():
+            if self._forget(event_id) is not None:
+                logger.warning(f"Stopped tracking game {event_id}, lease moved to another worker")
+
+    def release(self, event_id):
+        """Stop tracking a game and free its slot"""
+        if self.shard:
+            self.shard.release(event_id)
+        if self._forget(event_id) is not None:
+            logger.info(f"Released slot for game {event_id} ({len(self.games)}/{self.max_games} in use)")
+
+    def as_json(self):
+        """Tracked games with samples as plain lists, for jsonify"""
+        out = {}
+        for event_id, tracked in self.games.items():
+            out[event_id] = dict(tracked)
+            out[event_id]["samples"] = {k: v.to_list() for k, v in tracked["samples"].items()}
+        return out
+
+    def _forget(self, event_id):
+        """Drop a game and its timers; its tracking state, or None"""
+        self.timers.cancel((event_id, "stall"))
+        self.timers.cancel((event_id, "gone"))
+        return self.games.pop(event_id, None)
+
+    def _new_state(self, event_id):
+        """Fresh tracking state for one game"""
+        return {
+            "id": event_id,
+            "phase": RESERVED,
+            "samples": {"home": SampleSeries(), "away": SampleSeries(), "total": SampleSeries()},
+            "last_stamp": "",
+            "fingerprint": None,
+            "missed_cycles": 0,
+            "betting_window_fired": False,
+            "decision_complete": False,
+            "last_alert": 0,
+            "final_report_sent": False,
+            "models": {},        # projection model -> {"home", "away", "total"} points
+            "full_state": {},
+        }
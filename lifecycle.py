@@ -0,0 +1,90 @@
+"""Tracked game lifecycle: phases, allowed transitions, and a timing wheel for expiry"""
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+RESERVED = "reserved"   # slot taken, not processed yet
+SAMPLING = "sampling"   # Q1/Q2, collecting pace samples
+ALERTING = "alerting"   # Q3/Q4 before the betting decision
+DECIDED = "decided"     # betting decision sent, waiting for the final
+FINAL = "final"         # final report sent
+STALLED = "stalled"     # clock stopped moving in Q1/Q2, slot released
+GONE = "gone"           # dropped out of the feed, slot released
+
+TRANSITIONS = {
+    RESERVED: {SAMPLING, ALERTING, DECIDED, FINAL, STALLED, GONE},
+    SAMPLING: {ALERTING, DECIDED, FINAL, STALLED, GONE},
+    ALERTING: {DECIDED, FINAL, GONE},
+    DECIDED: {FINAL, GONE},
+    FINAL: set(),
+    STALLED: set(),
+    GONE: set(),
+}
+TERMINAL = frozenset(phase for phase, targets in TRANSITIONS.items() if not targets)
+
+def transition(tracked, phase):
+    """Move a tracked game to phase; False (and no change) if the move is not allowed"""
+    current = tracked["phase"]
+    if phase == current:
+        return True
+    if phase not in TRANSITIONS[current]:
+        logger.warning(f"Game {tracked['id']}: ignoring {current} -> {phase}")
+        return False
+    tracked["phase"] = phase
+    logger.info(f"Game {tracked['id']}: {current} -> {phase}")
+    return True
+
+class TimingWheel:
+    """Hashed timing wheel: schedule, cancel and expire keys in O(1) each
+
+    Deadlines fall into one of `slots` buckets of tick_seconds each.
+    advance() only visits the buckets that elapsed since the last call,
+    so its cost follows the number of due timers rather than the number
+    of scheduled ones. Deadlines further out than one turn of the wheel
+    share a bucket with nearer ones and are skipped until due.
+    """
+
+    def __init__(self, tick_seconds=1.0, slots=1024, now=0.0):
+        self.tick_seconds = tick_seconds
+        self._buckets = [set() for _ in range(slots)]
+        self._deadlines = {}   # key -> (deadline, bucket)
+        self._cursor = self._tick(now)
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def __contains__(self, key):
+        return key in self._deadlines
+
+    def schedule(self, key, deadline):
+        """Fire key at deadline, replacing any earlier schedule for it"""
+        self.cancel(key)
+        bucket = self._bucket(max(self._tick(deadline), self._cursor))
+        bucket.add(key)
+        self._deadlines[key] = (deadline, bucket)
+
+    def cancel(self, key):
+        entry = self._deadlines.pop(key, None)
+        if entry is not None:
+            entry[1].discard(key)
+
+    def advance(self, now):
+        """Remove and return the keys whose deadline is at or before now"""
+        target = self._tick(now)
+        expired = []
+        # Past a full turn every bucket has been visited once, which covers all keys
+        for tick in range(self._cursor, min(target, self._cursor + len(self._buckets) - 1) + 1):
+            bucket = self._bucket(tick)
+            for key in [key for key in bucket if self._deadlines[key][0] <= now]:
+                bucket.discard(key)
+                del self._deadlines[key]
+                expired.append(key)
+        self._cursor = max(self._cursor, target)
+        return expired
+
+    def _tick(self, t):
+        return math.floor(t / self.tick_seconds)
+
+    def _bucket(self, tick):
+        return self._buckets[tick % len(self._buckets)]
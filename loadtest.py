@@ -0,0 +1,435 @@
+"""End-to-end load test: main's /tick against local fake b365, Discord and Firestore
+
+    python loadtest.py --games 150 --speed 20 --duration 120
+    python loadtest.py --games 60 --discord-429 0.2 --discord-latency 0.3 --sharding
+    python loadtest.py --games 60 --serve          # through gunicorn instead of in-process
+
+Starts a fake events/inplay + odds server whose games run on a scaled
+game clock (stoppages, quarter breaks, overtime) and a fake Discord
+webhook that records arrivals and can answer 429 or respond slowly.
+main is pointed at them with API_BASE_URL and DISCORD_WEBHOOK, and
+/tick is driven in-process or against a gunicorn it starts. Reports
+tick throughput and latency percentiles, Discord traffic, and the delay
+from each game's Q4 start to its decision alert arriving.
+"""
+import argparse
+import bisect
+import json
+import logging
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+QUARTER_SECONDS = 300
+OT_SECONDS = 180
+BREAK_SECONDS = {2: 120}       # after Q2 (halftime); other breaks are BREAK_DEFAULT
+BREAK_DEFAULT = 60
+LINGER_SECONDS = 60            # a finished game stays in the feed this long
+POINTS = (1, 2, 2, 2, 2, 3, 3)
+TITLE = re.compile(r"^🏀 (.+) vs\. (.+) \| (Q\d|OT\d+), ")
+
+class SimGame:
+    """One synthetic game with its running clock and scoring fixed up front, in simulated seconds"""
+
+    def __init__(self, index, start, rng, force_ot=False):
+        self.event_id = str(900000 + index)
+        self.home_name = f"Load Home {index}"
+        self.away_name = f"Load Away {index}"
+        self.start = start
+        self.segments = []     # (sim start, sim end, quarter, clock elapsed in the quarter at start)
+        self.periods = {}      # quarter -> (event times, cumulative home, cumulative away)
+        self.q4_start = None
+
+        pace = rng.uniform(0.125, 0.155)          # total points per game second
+        home_share = rng.uniform(0.45, 0.55)
+        self.line = round(pace * 4 * QUARTER_SECONDS * 2) / 2
+        t, home, away, quarter = start, 0, 0, 1
+        while True:
+            length = QUARTER_SECONDS if quarter <= 4 else OT_SECONDS
+            if quarter == 4:
+                self.q4_start = t
+            done = 0.0
+            while done < length:                   # running clock, broken up by stoppages
+                run = min(length - done, rng.uniform(20, 90))
+                self.segments.append((t, t + run, quarter, done))
+                t += run
+                done += run
+                if done < length:
+                    t += rng.uniform(5, 40)
+
+            times, homes, aways = [0.0], [home], [away]
+            clock = rng.expovariate(pace / 2.2)
+            while clock < length:
+                points = rng.choice(POINTS)
+                if rng.random() < home_share:
+                    home += points
+                else:
+                    away += points
+                times.append(clock)
+                homes.append(home)
+                aways.append(away)
+                clock += rng.expovariate(pace / 2.2)
+            if quarter == 4 and force_ot and home != away:
+                # Late equalizer so the game goes to overtime
+                home, away = max(home, away), max(home, away)
+                times.append(length - 1)
+                homes.append(home)
+                aways.append(away)
+            if quarter >= 7 and home == away:
+                home += 1
+                times.append(length - 1)
+                homes.append(home)
+                aways.append(away)
+            self.periods[quarter] = (times, homes, aways)
+
+            if quarter >= 4 and home != away:
+                break
+            t += BREAK_SECONDS.get(quarter, BREAK_DEFAULT)
+            quarter += 1
+        self.end = t
+        self.overtime = quarter > 4
+        self._starts = [segment[0] for segment in self.segments]
+
+    def state(self, now):
+        """(quarter, seconds left in it, home, away) at sim time now, or None if not in the feed"""
+        if now < self.start or now > self.end + LINGER_SECONDS:
+            return None
+        i = bisect.bisect_right(self._starts, now) - 1
+        seg_start, seg_end, quarter, elapsed = self.segments[i]
+        elapsed += min(now, seg_end) - seg_start   # clock stopped between segments
+        length = QUARTER_SECONDS if quarter <= 4 else OT_SECONDS
+        times, homes, aways = self.periods[quarter]
+        j = bisect.bisect_right(times, elapsed) - 1
+        return quarter, max(0, int(length - elapsed)), homes[j], aways[j]
+
+    def feed_entry(self, now):
+        state = self.state(now)
+        if state is None:
+            return None
+        quarter, remaining, home, away = state
+        return {
+            "id": self.event_id,
+            "time_status": "1",
+            "home": {"name": self.home_name},
+            "away": {"name": self.away_name},
+            "ss": f"{home}-{away}",
+            "timer": {"q": str(quarter), "tm": str(remaining // 60), "ts": str(remaining % 60)},
+        }
+
+class _Server:
+    """ThreadingHTTPServer on a free localhost port, served from a daemon thread"""
+
+    def __init__(self, handler):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.httpd.daemon_threads = True
+        self.httpd.owner = self
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.httpd.shutdown()
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=b"", content_type="application/json", headers=()):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+class FakeB365(_Server):
+    """events/inplay and event/odds for a set of SimGames on a clock running speed times real time"""
+
+    def __init__(self, games, speed, latency=0.0):
+        self.games = {game.event_id: game for game in games}
+        self.speed = speed
+        self.latency = latency
+        self.started = time.time()
+        self.requests = {"inplay": 0, "odds": 0}
+        super().__init__(_B365Handler)
+
+    def sim_now(self):
+        return (time.time() - self.started) * self.speed
+
+    def wall_time(self, sim_time):
+        return self.started + sim_time / self.speed
+
+class _B365Handler(_Handler):
+    def do_HEAD(self):
+        self._send(200)
+
+    def do_GET(self):
+        fake = self.server.owner
+        url = urlparse(self.path)
+        if fake.latency:
+            time.sleep(random.uniform(0, fake.latency))
+        now = fake.sim_now()
+        if url.path.endswith("/events/inplay"):
+            fake.requests["inplay"] += 1
+            results = [entry for entry in (game.feed_entry(now) for game in fake.games.values()) if entry]
+            return self._send(200, json.dumps({"success": 1, "pager": {"total": len(results)},
+                                               "results": results}).encode())
+        if "/event/odds" in url.path:
+            fake.requests["odds"] += 1
+            game = fake.games.get(parse_qs(url.query).get("event_id", [""])[0])
+            if game is None:
+                return self._send(200, json.dumps({"success": 1, "results": []}).encode())
+            odds = {
+                "18_3": [{"total": str(game.line), "over_od": "1.909", "under_od": "1.909"}],
+                "18_2": [{"handicap": "-2.5", "home_od": "1.909", "away_od": "1.909"}],
+            }
+            return self._send(200, json.dumps({"success": 1, "results": [odds]}).encode())
+        self._send(404, b'{"success":0}')
+
+class FakeDiscord(_Server):
+    """Webhook that records (arrival time, payload), with optional 429s and response latency"""
+
+    def __init__(self, rate_limit=0.0, latency=0.0, retry_after=0.25):
+        self.rate_limit = rate_limit
+        self.latency = latency
+        self.retry_after = retry_after
+        self.arrivals = []
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+        super().__init__(_DiscordHandler)
+
+class _DiscordHandler(_Handler):
+    def do_GET(self):
+        self._send(200, b'{"type":1}')
+
+    def do_POST(self):
+        fake = self.server.owner
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if fake.latency:
+            time.sleep(random.uniform(0, fake.latency))
+        if random.random() < fake.rate_limit:
+            with fake._lock:
+                fake.rate_limited += 1
+            body = json.dumps({"message": "You are being rate limited.", "retry_after": fake.retry_after})
+            return self._send(429, body.encode(), headers=[("Retry-After", str(fake.retry_after))])
+        with fake._lock:
+            fake.arrivals.append((time.time(), payload))
+        self._send(204)
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list, None when empty"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))]
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _env(args, b365, discord):
+    return {
+        "API_BASE_URL": b365.url,
+        "API_TOKEN": "loadtest",
+        "DISCORD_WEBHOOK": f"{discord.url}/webhook",
+        "MAX_TRACKED_GAMES": str(args.max_tracked),
+        "SCHEDULER_ENABLED": "0",
+        "SHARDING_ENABLED": "0",
+        "SNAPSHOT_BACKEND": "",
+        "TICK_STORE_PATH": "",
+    }
+
+class InProcessTarget:
+    """Drives main.app through Flask's test client; main is imported after the env is set"""
+
+    def __init__(self, args):
+        import main
+
+        logging.getLogger().setLevel(logging.DEBUG if args.verbose else logging.WARNING)
+        self.main = main
+        self.client = main.app.test_client()
+        self.db = None
+        if args.sharding:
+            from fakes import InMemoryFirestore
+            from sharding import ShardCoordinator
+
+            self.db = InMemoryFirestore()
+            main.shard = main.tracker.shard = ShardCoordinator(self.db, worker_id="loadtest")
+            main.shard.start()
+
+    def tick(self):
+        response = self.client.get("/tick")
+        return response.status_code, response.data
+
+    def stop(self):
+        self.main.discord.stop_dispatcher(timeout=30)
+        if self.main.shard:
+            self.main.shard.stop()
+
+class GunicornTarget:
+    """Runs main under gunicorn, configured like the Dockerfile, and drives it over HTTP"""
+
+    def __init__(self, args, env):
+        import requests
+
+        self.session = requests.Session()
+        self.db = None
+        port = _free_port()
+        self.url = f"http://127.0.0.1:{port}"
+        log = open(args.serve_log, "w") if args.serve_log else subprocess.DEVNULL
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "--bind", f"127.0.0.1:{port}", "--workers", "1",
+             "--threads", "2", "--timeout", "60", "main:app"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), env={**os.environ, **env}, stdout=log, stderr=log)
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                self.session.get(self.url + "/", timeout=1)
+                break
+            except requests.ConnectionError:
+                if time.monotonic() > deadline or self.process.poll() is not None:
+                    raise RuntimeError("gunicorn did not start; see --serve-log")
+                time.sleep(0.2)
+
+    def tick(self):
+        response = self.session.get(self.url + "/tick", timeout=120)
+        return response.status_code, response.content
+
+    def stop(self):
+        self.process.terminate()   # SIGTERM: graceful exit flushes the Discord queue
+        self.process.wait(timeout=60)
+
+def run(args):
+    rng = random.Random(args.seed)
+    games = [SimGame(i, rng.uniform(-QUARTER_SECONDS, args.spread), rng, force_ot=rng.random() < args.overtime)
+             for i in range(args.games)]
+    b365 = FakeB365(games, args.speed, args.api_latency)
+    discord = FakeDiscord(args.discord_429, args.discord_latency)
+    env = _env(args, b365, discord)
+
+    if args.serve:
+        target = GunicornTarget(args, env)
+    else:
+        os.environ.update(env)
+        target = InProcessTarget(args)
+
+    latencies, tracked, errors, shed = [], [], 0, {}
+    started = time.monotonic()
+    while time.monotonic() - started < args.duration:
+        tick_start = time.perf_counter()
+        status, body = target.tick()
+        latencies.append(time.perf_counter() - tick_start)
+        if status != 200:
+            errors += 1
+        else:
+            result = json.loads(body)
+            tracked.append(len(result.get("tracked_games", {})))
+            for kind, count in (result.get("budget") or {}).get("shed", {}).items():
+                shed[kind] = shed.get(kind, 0) + count
+        time.sleep(max(0.0, args.interval - latencies[-1]))
+    elapsed = time.monotonic() - started
+    sim_end = b365.sim_now()
+    target.stop()
+    time.sleep(0.5)
+    b365.stop()
+    discord.stop()
+
+    # Q4 start -> first Q4 embed for the game, which is the betting decision
+    by_name = {game.home_name: game for game in games}
+    first_q4 = {}
+    finals = 0
+    for arrived, payload in discord.arrivals:
+        if "FINAL" in payload.get("content", ""):
+            finals += 1
+        for embed in payload.get("embeds", []):
+            match = TITLE.match(embed.get("title", ""))
+            if match and match.group(3) == "Q4" and match.group(1) in by_name:
+                first_q4.setdefault(by_name[match.group(1)].event_id, arrived)
+    # Games whose Q4 started at least one tick interval before the run ended
+    last_q4 = sim_end - args.interval * args.speed
+    reached_q4 = [game for game in games if game.q4_start is not None and 0 <= game.q4_start <= last_q4]
+    delays = [first_q4[game.event_id] - b365.wall_time(game.q4_start)
+              for game in reached_q4 if game.event_id in first_q4]
+
+    return {
+        "games": args.games,
+        "overtime_games": sum(game.overtime for game in games),
+        "speed": args.speed,
+        "wall_seconds": round(elapsed, 1),
+        "ticks": len(latencies),
+        "tick_errors": errors,
+        "ticks_per_second": round(len(latencies) / elapsed, 2),
+        "tracked_per_tick": round(sum(tracked) / len(tracked), 1) if tracked else 0,
+        "game_updates_per_second": round(sum(tracked) / elapsed, 1),
+        "tick_latency_ms": {f"p{p}": _ms(percentile(latencies, p)) for p in (50, 90, 99)} | {"max": _ms(max(latencies, default=None))},
+        "shed": shed,
+        "b365_requests": dict(b365.requests),
+        "discord": {"posts": len(discord.arrivals), "rate_limited": discord.rate_limited,
+                    "embeds": sum(len(p.get("embeds", [])) for _, p in discord.arrivals), "finals": finals},
+        "q4_decisions": {"reached_q4": len(reached_q4), "alerted": len(delays),
+                         **{f"delay_p{p}_s": _round(percentile(delays, p)) for p in (50, 90, 99)},
+                         "delay_max_s": _round(max(delays, default=None))},
+        "firestore": None if target.db is None else
+                     {"reads": target.db.reads, "writes": target.db.writes, "commits": target.db.commits},
+    }
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+def _round(seconds):
+    return None if seconds is None else round(seconds, 2)
+
+def format_report(report):
+    lat, q4, d = report["tick_latency_ms"], report["q4_decisions"], report["discord"]
+    lines = [
+        f"{report['games']} games ({report['overtime_games']} to overtime) at {report['speed']}x, "
+        f"{report['wall_seconds']}s wall",
+        f"ticks        {report['ticks']} ({report['ticks_per_second']}/s, {report['tick_errors']} errors), "
+        f"{report['tracked_per_tick']} tracked per tick, {report['game_updates_per_second']} game updates/s",
+        f"tick latency p50 {lat['p50']} ms  p90 {lat['p90']} ms  p99 {lat['p99']} ms  max {lat['max']} ms",
+        f"shed         {report['shed'] or 'nothing'}",
+        f"b365         {report['b365_requests']['inplay']} inplay, {report['b365_requests']['odds']} odds requests",
+        f"discord      {d['posts']} posts, {d['embeds']} embeds, {d['finals']} finals, {d['rate_limited']} answered 429",
+        f"Q4 -> alert  {q4['alerted']}/{q4['reached_q4']} games alerted; delay p50 {q4['delay_p50_s']}s  "
+        f"p90 {q4['delay_p90_s']}s  p99 {q4['delay_p99_s']}s  max {q4['delay_max_s']}s",
+    ]
+    if report["firestore"]:
+        f = report["firestore"]
+        lines.append(f"firestore    {f['reads']} reads, {f['writes']} writes, {f['commits']} commits")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--speed", type=float, default=20, help="game seconds per real second")
+    parser.add_argument("--duration", type=float, default=90, help="wall seconds to drive /tick")
+    parser.add_argument("--interval", type=float, default=2, help="wall seconds between tick starts")
+    parser.add_argument("--spread", type=float, default=900, help="game start times spread over this many game seconds")
+    parser.add_argument("--overtime", type=float, default=0.1, help="fraction of games forced into overtime")
+    parser.add_argument("--max-tracked", type=int, default=200)
+    parser.add_argument("--api-latency", type=float, default=0.0, help="max seconds added to each b365 response")
+    parser.add_argument("--discord-429", type=float, default=0.0, help="fraction of webhook posts answered 429")
+    parser.add_argument("--discord-latency", type=float, default=0.0, help="max seconds added to each webhook post")
+    parser.add_argument("--sharding", action="store_true", help="shard leases in an in-memory Firestore (in-process only)")
+    parser.add_argument("--serve", action="store_true", help="run main under gunicorn instead of in-process")
+    parser.add_argument("--serve-log", help="file for gunicorn's output with --serve")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    if args.serve and args.sharding:
+        parser.error("--sharding needs the in-process target")
+
+    report = run(args)
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+if __name__ == "__main__":
+    main()
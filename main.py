@@ -1,19 +1,44 @@
 """Basketball projections API"""
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify, request
+import atexit
 import os
 import logging
+import signal
+import threading
 import time
-from api_client import fetch_games
-from firestore_manager import FirestoreManager
-from discord_client import DiscordClient, build_game_embed
-from projections import ProjectionEngine
+from api_client import fetch_snapshots, warm_up as warm_up_api
+from discord_client import DiscordClient, build_game_embed, PRIORITY_DECISION, PRIORITY_FINAL
+from projections import ProjectionEngine, PROJECTION_MODELS
+from game_tracker import GameTracker
+from lifecycle import DECIDED, FINAL, STALLED
+from odds_client import OddsFetcher
+from scheduler import PollingScheduler, poll_interval
+from budget import TickBudget
+from read_model import ReadModel, dumps
+from snapshot import TrackerSnapshots, make_backend
+from tick_store import TickWriter
+from config import (MAX_TRACKED_GAMES, SCHEDULER_ENABLED, POLL_MAX_PER_MINUTE, POLL_JITTER,
+                    POLL_NORMAL_SECONDS, SHARDING_ENABLED, GCS_PROJECT, TICK_STORE_PATH, TICK_BUDGET_SECONDS)
+from metrics import (TICK_SECONDS, GAMES_SEEN, SAMPLES_APPENDED, ALERTS_SENT, STALLS_RELEASED,
+                     GAMES_GONE, TRACKED_GAMES, span, render as render_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE)
 
 app = Flask(__name__)
-
-# ---- GLOBAL state, for one slot (replace with Firestore later)
-tracked_game = {}      # holds gameId, state, etc.
+engine = ProjectionEngine()
+
+# ---- GLOBAL state, one slot per tracked game (replace with Firestore later)
+# With SHARDING_ENABLED each worker/instance only tracks the games it holds a lease on
+shard = None
+if SHARDING_ENABLED:
+    from google.cloud import firestore
+    from sharding import ShardCoordinator, check_lease_ttl
+    check_lease_ttl()
+    shard = ShardCoordinator(firestore.Client(project=GCS_PROJECT))
+    shard.start()
+    atexit.register(shard.stop)
+tracker = GameTracker(MAX_TRACKED_GAMES, shard=shard)
 ALERT_THRESHOLD_POINTS = 5
 ALERT_MIN_INTERVAL = 30   # seconds
+SIDES = ("home", "away", "total")
 
 # Configure logger for better visibility
 logging.basicConfig(level=logging.INFO)
@@ -23,122 +48,221 @@ DISCORD_WEBHOOK = os.getenv('DISCORD_WEBHOOK', '')
 if not DISCORD_WEBHOOK:
     logger.warning("DISCORD_WEBHOOK environment variable not set!")
 discord = DiscordClient(DISCORD_WEBHOOK)
-
-def process_tracked_slot_one(games, discord, odds_fetcher):
-    global tracked_game
-    now = int(time.time())
-
-    # 1. TRACK OR SELECT GAME
-    if not tracked_game.get("id"):
-        for g in games:
-            # Defensive check for timer data
-            timer = g.get('timer')
-            if not timer or 'q' not in timer:
-                logger.warning(f"Game missing timer/q: {g}")
-                continue
-            try:
-                q = int(timer['q'])
-            except Exception as e:
-                logger.warning(f"Invalid quarter in timer for game {g}: {e}")
-                continue
-            # Pick a Q1 or Q2 game not being tracked already
-            if q == 1 or q == 2:
-                tracked_game = {
-                    "id": g['id'],
-                    "samples": {"home": [], "away": [], "total": []},
-                    "last_stamp": "",
-                    "missed_cycles": 0,
-                    "betting_window_fired": False,
-                    "decision_complete": False,
-                    "last_alert": 0,
-                    "final_report_sent": False,
-                    "full_state": {},
-                }
-                logger.info(f"Now tracking game: {g['id']}")
-                break
-        return  # If not found, wait till next tick
-
-    # 2. FIND MATCHING GAME IN LIVE DATA
-    game = next((g for g in games if g['id'] == tracked_game['id']), None)
-    if not game:
-        logger.warning("Tracked game not found in live games!")
-        return
-
-    # 3. CORE LOGIC (PORTED FROM PROCESSGAME)
-    ss = game.get('ss')
-    if not ss or '-' not in ss:
-        logger.warning(f"Game missing or invalid ss (score): {game}")
-        return
-
+discord.start_dispatcher()
+atexit.register(discord.stop_dispatcher)
+odds_fetcher = OddsFetcher()
+tick_writer = TickWriter(TICK_STORE_PATH) if TICK_STORE_PATH else None   # sampled tick history
+tick_lock = threading.Lock()   # one tick at a time, from /tick or the scheduler
+read_model = ReadModel()       # what /projections serves, republished after every tick
+
+def save_snapshot():
+    """Snapshot tracked games, waiting briefly for a running tick to finish"""
+    locked = tick_lock.acquire(timeout=2)
     try:
-        home_score, away_score = map(int, ss.split('-'))
-    except Exception as e:
-        logger.error(f"Failed to parse score for game {tracked_game.get('id')}: {e}")
-        return
-
-    timer = game.get('timer')
-    if not timer or not all(k in timer for k in ['q', 'tm', 'ts']):
-        logger.warning(f"Game missing timer/q/tm/ts: {game}")
-        return
-
-    try:
-        q = int(timer['q'])
-        m = int(timer['tm'])
-        s = int(timer['ts'])
-    except Exception as e:
-        logger.warning(f"Invalid timer values for game {game}: {e}")
-        return
-
-    stamp = f"{q}-{m}-{s}"
-    total_score = home_score + away_score
+        tracker_snapshots.save()
+    finally:
+        if locked:
+            tick_lock.release()
+
+def snapshot_on_sigterm(signum, frame):
+    """Cloud Run sends SIGTERM before stopping an instance; save first, then run the previous handler"""
+    save_snapshot()
+    if callable(previous_sigterm):
+        previous_sigterm(signum, frame)
+    elif previous_sigterm != signal.SIG_IGN:
+        raise SystemExit(0)
+
+# ---- Resume tracked games from the last snapshot (SNAPSHOT_BACKEND), saved periodically and on SIGTERM
+tracker_snapshots = None
+snapshot_backend = make_backend(key=shard.worker_id if shard else None)
+if snapshot_backend:
+    tracker_snapshots = TrackerSnapshots(snapshot_backend, tracker)
+    tracker_snapshots.restore()
+    read_model.publish(tracker.games)
+    atexit.register(save_snapshot)
+    if threading.current_thread() is threading.main_thread():
+        previous_sigterm = signal.getsignal(signal.SIGTERM)
+        signal.signal(signal.SIGTERM, snapshot_on_sigterm)
+
+def run_tick():
+    """Fetch the feed and process it within TICK_BUDGET_SECONDS; (snapshots, budget)"""
+    with tick_lock:
+        budget = TickBudget(TICK_BUDGET_SECONDS)
+        with TICK_SECONDS.time():
+            snapshots = fetch_snapshots(budget)
+            process_tracked_games(snapshots, discord, odds_fetcher, budget)
+            read_model.publish(tracker.games)
+        TRACKED_GAMES.set(len(tracker))
+        if tracker_snapshots and budget.allow("snapshot"):
+            tracker_snapshots.maybe_save()
+        budget.report()
+    return snapshots, budget
+
+def scheduled_tick():
+    """Scheduler callback: run a tick, then pick the next delay from game phase"""
+    snapshots, _ = run_tick()
+    return poll_interval(snapshots, tracker)
+
+def process_tracked_games(snapshots, discord, odds_fetcher, budget=None):
+    """Select new games and process every tracked game in this tick's feed"""
+    # 1. INDEX LIVE GAMES, EXPIRE STALLED/VANISHED ONES AND FILL FREE SLOTS
+    live_games = {snap.event_id: snap for snap in snapshots}
+    GAMES_SEEN.inc(len(live_games))
+    tracker.sync_shard()
+    release_expired_games(discord)
+    new_ids = set(tracker.select_new_games(live_games))
+
+    # 2. FIND EACH TRACKED GAME IN LIVE DATA
+    pending = []
+    with span("parse"):
+        for event_id in list(tracker.games):
+            if event_id in new_ids:
+                continue  # Newly selected, start processing next tick
+            snap = live_games.get(event_id)
+            if not snap:
+                continue  # the gone timer releases it if it stays away
+            tracked_game = tracker.games[event_id]
+            reading = read_tracked_slot(snap, tracked_game, discord)
+            if reading:
+                pending.append((snap, tracked_game, reading))
+
+    # 3. ONE VECTORIZED PROJECTION PASS FOR ALL SAMPLED GAMES
+    project_and_alert(pending, discord, odds_fetcher, budget)
+
+def release_expired_games(discord):
+    """Free the slots of games whose stall or disappearance timer ran out"""
+    for event_id, phase, tracked_game in tracker.expire():
+        if tick_writer:
+            tick_writer.close_game(event_id)
+        if phase == STALLED:
+            discord.send_message(f"Game stalled (no clock update for {tracker.stall_seconds:.0f}s), releasing slot.")
+            logger.info(f"Released stalled game {event_id}")
+            STALLS_RELEASED.inc()
+        else:
+            logger.warning(f"Tracked game {event_id} gone from live games for {tracker.gone_seconds:.0f}s, releasing slot")
+            GAMES_GONE.inc()
+
+def process_tracked_slot_one(snap, tracked_game, discord, odds_fetcher, budget=None):
+    """Process a single tracked game"""
+    reading = read_tracked_slot(snap, tracked_game, discord)
+    if reading:
+        project_and_alert([(snap, tracked_game, reading)], discord, odds_fetcher, budget)
+
+def read_tracked_slot(snap, tracked_game, discord):
+    """Lifecycle bookkeeping for one tracked game; (q, m, s, home, away) if it should be sampled"""
+    # UNCHANGED SCORE AND CLOCK: only the stall counter moves
+    if tracked_game["fingerprint"] == snap.fingerprint:
+        tracker.observe(snap.event_id, snap, clock_moved=False)
+        tracked_game["missed_cycles"] += 1
+        return None
+    tracked_game["fingerprint"] = snap.fingerprint
 
-    played = (q-1)*300 + (300 - (m*60+s))
+    q, m, s = snap.quarter, snap.minute, snap.second
+    stamp = snap.stamp
 
-    logger.info(f"Tracking: id={tracked_game.get('id')}, q={q}, m={m}, s={s}, scores: {home_score}-{away_score}, played={played}")
-    logger.info(f"Samples: home={tracked_game['samples']['home']} away={tracked_game['samples']['away']} total={tracked_game['samples']['total']}")
+    logger.info(f"Tracking: id={snap.event_id}, q={q}, m={m}, s={s}, scores: {snap.home_score}-{snap.away_score}")
+    logger.info(f"Samples: home={len(tracked_game['samples']['home'])} away={len(tracked_game['samples']['away'])} total={len(tracked_game['samples']['total'])}")
 
-    # STALE/NO UPDATE DETECTION
-    if tracked_game["last_stamp"] == stamp:
+    # STALE/NO UPDATE DETECTION (score moved with the clock stopped)
+    clock_moved = tracked_game["last_stamp"] != stamp
+    tracker.observe(snap.event_id, snap, clock_moved)
+    if not clock_moved:
         tracked_game["missed_cycles"] += 1
-        if tracked_game["missed_cycles"] > 8 and q <= 2:
-            discord.send_message(f"Game stalled (Q{q}, no update 8 cycles), releasing slot.")
-            logger.info("Releasing stalled game slot.")
-            tracked_game.clear()
-        return
+        return None
     tracked_game["last_stamp"] = stamp
     tracked_game["missed_cycles"] = 0
 
     # SKIP Q1
     if q == 1:
-        return
-
-    # SAMPLES
-    if played <= 0:
-        return
+        return None
 
-    engine = ProjectionEngine()
+    return q, m, s, snap.home_score, snap.away_score
 
-    # Instead of inline calculations, use your ProjectionEngine:
-    home_pps = engine.calculate_pps(home_score, played)
-    away_pps = engine.calculate_pps(away_score, played)
-    total_pps = engine.calculate_pps(total_score, played)
+def is_critical(tracked_game, reading):
+    """Q4 decision not sent yet, or the game just ended: never shed"""
+    q, m, s, home_score, away_score = reading
+    return q == 4 and (not tracked_game["betting_window_fired"]
+                       or (m == 0 and s == 0 and home_score != away_score))
 
-    # Store samples as before
-    tracked_game["samples"]["home"].append(home_pps)
-    tracked_game["samples"]["away"].append(away_pps)
-    tracked_game["samples"]["total"].append(total_pps)
+def project_and_alert(pending, discord, odds_fetcher, budget=None):
+    """Project all pending (snapshot, tracked_game, reading) rows in one batch, then alert
 
-    # Use engine to calculate raw and averaged projections
-    home_raw = engine.project_points(home_score, played)
-    away_raw = engine.project_points(away_score, played)
-    total_raw = engine.project_points(total_score, played)
+    Critical games get odds and alerts first; the rest only while the
+    tick budget lasts.
+    """
+    if not pending:
+        return
+    budget = budget or TickBudget()
+
+    with span("projection"):
+        readings = [reading for _, _, reading in pending]
+        q_arr, m_arr, s_arr, home_arr, away_arr = zip(*readings)
+        series = [tracked_game["samples"] for _, tracked_game, _ in pending]
+        batch = engine.project_batch(
+            q_arr, m_arr, s_arr, home_arr, away_arr,
+            home_sums=[x["home"].total for x in series],
+            away_sums=[x["away"].total for x in series],
+            total_sums=[x["total"].total for x in series],
+            sample_counts=[len(x["total"]) for x in series],
+            home_ewmas=[x["home"].ewma for x in series],
+            away_ewmas=[x["away"].ewma for x in series],
+            total_ewmas=[x["total"].ewma for x in series],
+        )
+        columns = {k: v.tolist() for k, v in batch.items()}
 
-    home_avg = engine.project_points_from_samples(tracked_game["samples"]["home"])
-    away_avg = engine.project_points_from_samples(tracked_game["samples"]["away"])
-    total_avg = engine.project_points_from_samples(tracked_game["samples"]["total"])
+        sampled = []
+        for i, (snap, tracked_game, reading) in enumerate(pending):
+            if not columns["valid"][i]:
+                continue
 
-    # Dummy values for line/reliability/momentum (replace with your own logic as needed)
-    home_line = total_line = away_line = 110
+            # Store samples as before
+            tracked_game["samples"]["home"].append(columns["home_pps"][i])
+            tracked_game["samples"]["away"].append(columns["away_pps"][i])
+            tracked_game["samples"]["total"].append(columns["total_pps"][i])
+            tracked_game["models"] = {name: {side: columns[f"model_{name}_{side}"][i] for side in SIDES}
+                                      for name in PROJECTION_MODELS}
+            if tick_writer and budget.allow("history"):
+                tick_writer.append(snap.event_id, *reading, columns["home_pps"][i],
+                                   columns["away_pps"][i], columns["total_pps"][i])
+            sampled.append(i)
+    SAMPLES_APPENDED.inc(len(sampled))
+
+    critical = {i for i in sampled if is_critical(pending[i][1], pending[i][2])}
+    sampled.sort(key=lambda i: i not in critical)
+
+    # Odds only matter from Q3 on; one hedged, cached lookup for all of them
+    odds = {}
+    if odds_fetcher:
+        wanted = {pending[i][0].event_id: columns["played"][i] for i in sampled
+                  if pending[i][2][0] >= 3 and (i in critical or budget.allow("odds"))}
+        if wanted:
+            odds = odds_fetcher.get_odds_many(wanted, budget)
+
+    for i in sampled:
+        snap, tracked_game, reading = pending[i]
+        projection = {k: columns[k][i] for k in (
+            "home_raw", "away_raw", "total_raw", "home_avg", "away_avg", "total_avg")}
+        send_tracked_alerts(snap, tracked_game, discord, odds.get(snap.event_id), reading, projection, budget)
+
+def send_tracked_alerts(snap, tracked_game, discord, odds_info, reading, projection, budget=None):
+    """Q3/Q4 alerts, betting decision and final report for one tracked game"""
+    now = int(time.time())
+    q, m, s, home_score, away_score = reading
+    total_score = home_score + away_score
+    home_raw, away_raw, total_raw = projection["home_raw"], projection["away_raw"], projection["total_raw"]
+    home_avg, away_avg, total_avg = projection["home_avg"], projection["away_avg"], projection["total_avg"]
+
+    # Lines from odds when available; without odds there is no line to bet against
+    home_line = total_line = away_line = None
+    if odds_info:
+        total_line = odds_info["totalLine"]
+        team_totals = engine.calculate_team_totals(total_line, odds_info["spread"])
+        if odds_info["spread"] < 0:
+            home_line, away_line = team_totals["high"], team_totals["low"]
+        else:
+            home_line, away_line = team_totals["low"], team_totals["high"]
+
+    # Dummy values for reliability/momentum (replace with your own logic as needed)
     reliability = "⚠️ CAUTION"
     home_momentum = "📉 SLOWING DOWN"
     away_momentum = "⚡ HEATING UP"
@@ -146,29 +270,42 @@ def process_tracked_slot_one(games, discord, odds_fetcher):
     # Q4: BETTING DECISION WINDOW (once per tracked session)
     if q == 4 and not tracked_game["betting_window_fired"]:
         tracked_game["betting_window_fired"] = True
-        last_line = total_line
-        diff = total_avg - last_line
         rec = "NO BET"
-        if isinstance(last_line, (int, float)):
-            if abs(diff) > ALERT_THRESHOLD_POINTS:
-                rec = "OVER" if diff > 0 else "UNDER"
+        if total_line is not None and abs(total_avg - total_line) > ALERT_THRESHOLD_POINTS:
+            rec = "OVER" if total_avg > total_line else "UNDER"
+        # Experimental picks from the blended model (main.js experimental* fields)
+        blended = tracked_game["models"].get("blended", {})
+        lines = {"total": total_line, "home": home_line, "away": away_line} if odds_info else {}
+        for side in SIDES:
+            exp_rec = "NO BET"
+            if side in lines and blended.get(side) is not None:
+                exp_diff = blended[side] - lines[side]
+                if abs(exp_diff) >= engine.EXP_THRESHOLD:
+                    exp_rec = "OVER" if exp_diff > 0 else "UNDER"
+            tracked_game[f"experimental_blended_{side}"] = blended.get(side)
+            tracked_game[f"experimental_{side}_line"] = lines.get(side)
+            tracked_game[f"experimental_{side}_rec"] = exp_rec
         embed = build_game_embed(
-            game, home_score, away_score, total_score, q, m, s,
+            snap.raw, home_score, away_score, total_score, q, m, s,
             home_raw, home_avg, away_raw, away_avg, total_raw, total_avg,
             home_line, away_line, total_line,
             home_momentum, away_momentum, reliability,
-            len(tracked_game["samples"]["total"])
+            len(tracked_game["samples"]["total"]), recommendation=rec
         )
         logger.info(f"Sending Q4 betting decision: {rec}")
-        discord.send_embed(**embed)
+        discord.send_embed(**embed, priority=PRIORITY_DECISION)
+        ALERTS_SENT.inc(kind="decision")
         tracked_game["decision_complete"] = True
+        tracker.set_phase(tracked_game["id"], DECIDED)
         tracked_game["last_alert"] = now
         return
 
     # Q3/Q4: AUTOMATED ALERTS (sampled every 30s, only if not fired very recently)
-    if q >= 3 and (now - tracked_game.get("last_alert", 0)) >= ALERT_MIN_INTERVAL:
+    # Shed when the tick runs short: last_alert stays put, so it goes out next tick instead
+    due = q >= 3 and (now - tracked_game.get("last_alert", 0)) >= ALERT_MIN_INTERVAL
+    if due and (budget is None or budget.allow("alert")):
         embed = build_game_embed(
-            game, home_score, away_score, total_score, q, m, s,
+            snap.raw, home_score, away_score, total_score, q, m, s,
             home_raw, home_avg, away_raw, away_avg, total_raw, total_avg,
             home_line, away_line, total_line,
             home_momentum, away_momentum, reliability,
@@ -176,36 +313,87 @@ def process_tracked_slot_one(games, discord, odds_fetcher):
         )
         logger.info(f"Sending alert (Q{q}, t={m:02}:{s:02}, total_samples={len(tracked_game['samples']['total'])})")
         discord.send_embed(**embed)
+        ALERTS_SENT.inc(kind="projection")
         tracked_game["last_alert"] = now
         return
 
     # GAME END (Q4 0:00, not tied)
     if q == 4 and m == 0 and s == 0 and home_score != away_score and not tracked_game.get("final_report_sent"):
-        msg = f"🏁 FINAL: {game['home']['name']} vs. {game['away']['name']} ended {home_score}-{away_score} (Total: {total_score})"
+        msg = f"🏁 FINAL: {snap.home_name} vs. {snap.away_name} ended {home_score}-{away_score} (Total: {total_score})"
         logger.info("Sending final report.")
-        discord.send_message(msg)
+        discord.send_message(msg, priority=PRIORITY_FINAL)
+        ALERTS_SENT.inc(kind="final")
         tracked_game["final_report_sent"] = True
-        tracked_game.clear()
+        tracker.set_phase(tracked_game["id"], FINAL)
+        tracker.release(tracked_game["id"])
+        if tick_writer:
+            tick_writer.close_game(tracked_game["id"])
+
+def warm_up():
+    """Load lazy imports and open pooled connections; seconds per step, or the error"""
+    steps = [
+        ("numpy", lambda: engine.project_batch([2], [5], [0], [20], [20])),
+        ("api", warm_up_api),
+        ("discord", discord.warm_up),
+    ]
+    if shard:
+        steps.append(("firestore", lambda: shard.heartbeat(force=True)))
+
+    timings = {}
+    for name, step in steps:
+        start = time.perf_counter()
+        try:
+            step()
+            timings[name] = round(time.perf_counter() - start, 4)
+        except Exception as e:
+            logger.warning(f"Warm-up step {name} failed: {e}")
+            timings[name] = f"error: {e}"
+    return timings
 
 @app.route("/")
 def index():
     return jsonify({"msg": "Basketball projections API is running."})
 
+def entity_response(entity):
+    """Pre-encoded JSON with its ETag; 304 when the client already has it"""
+    response = Response(entity.body, mimetype="application/json")
+    response.set_etag(entity.etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
 @app.route("/projections")
 def projections():
-    return jsonify({"ok": True, "tracked_game": tracked_game})
+    return entity_response(read_model.current.projections)
+
+@app.route("/projections/summary")
+def projections_summary():
+    return entity_response(read_model.current.summary)
+
+@app.route("/projections/<event_id>")
+def game_projection(event_id):
+    entity = read_model.current.games.get(event_id)
+    if entity is None:
+        return jsonify({"ok": False, "error": f"Game {event_id} is not tracked"}), 404
+    return entity_response(entity)
 
 @app.route("/tick")
 def tick():
     try:
-        games = fetch_games()
-        odds_fetcher = None  # Implement as needed
-        process_tracked_slot_one(games, discord, odds_fetcher)
-        return jsonify({"ok": True, "tracked_game": tracked_game})
+        _, budget = run_tick()
+        body = b'{"ok":true,"budget":' + dumps(budget.summary()) + b',"tracked_games":' + read_model.current.games_body + b"}"
+        return Response(body, mimetype="application/json")
     except Exception as e:
         logger.exception("Error in /tick")
         return jsonify({"ok": False, "error": str(e)}), 500
 
+@app.route("/warmup")
+def warmup():
+    return jsonify({"ok": True, "seconds": warm_up()})
+
+@app.route("/metrics")
+def metrics():
+    return Response(render_metrics(), content_type=METRICS_CONTENT_TYPE)
+
 @app.route("/test-alert")
 def test_alert():
     discord.send_message("Test Alert: Discord connection working!")
@@ -227,5 +415,11 @@ def test_embed():
     discord.send_embed(**embed_data)
     return jsonify({"ok": True})
 
+# ---- Built-in polling; /tick keeps working alongside it
+poller = PollingScheduler(scheduled_tick, POLL_MAX_PER_MINUTE, POLL_JITTER, error_delay=POLL_NORMAL_SECONDS)
+if SCHEDULER_ENABLED:
+    poller.start()
+    atexit.register(poller.stop)
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=int(os.getenv("PORT", 8080)))
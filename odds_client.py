@@ -0,0 +1,219 @@
+"""Odds fetching - Python port of getOddsWithFallback/normalizeOdds"""
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from api_client import get_json
+from metrics import API_ERRORS, span
+
+logger = logging.getLogger(__name__)
+
+TOTAL_MARKETS = ('18_3', '18_9', '18_6')
+SPREAD_MARKET = '18_2'
+
+def odds_urls(event_id):
+    """The b365 odds endpoints tried for an event, in fallback order"""
+    from config import API_BASE_URL, API_TOKEN
+    return [
+        f"{API_BASE_URL}/v1/event/odds?token={API_TOKEN}&event_id={event_id}",
+        f"{API_BASE_URL}/v2/event/odds?token={API_TOKEN}&event_id={event_id}&odds_market=3",
+        f"{API_BASE_URL}/v2/event/odds?token={API_TOKEN}&event_id={event_id}",
+        f"{API_BASE_URL}/v2/event/odds/summary?token={API_TOKEN}&event_id={event_id}",
+    ]
+
+def _to_number(value):
+    """Finite float from a number or numeric string, else None"""
+    if isinstance(value, bool) or value is None:
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+def normalize_odds(results):
+    """Extract total line, spread and prices from b365 odds results (mirrors normalizeOdds)"""
+    markets = results if isinstance(results, list) else [results]
+
+    total_line = None
+    over_odds = under_odds = source_market = ''
+    for entry in markets:
+        for key in TOTAL_MARKETS:
+            arr = entry.get(key) if isinstance(entry, dict) else None
+            if not arr or not isinstance(arr, list):
+                continue
+            m = arr[0]
+            line = _to_number(m.get('total'))
+            if line is None:
+                line = _to_number(m.get('handicap'))
+            if line is not None:
+                total_line = line
+                over_odds = m.get('over_od') or m.get('over_odds') or m.get('o') or ''
+                under_odds = m.get('under_od') or m.get('under_odds') or m.get('u') or ''
+                source_market = key
+                break
+        if total_line is not None:
+            break
+
+    spread = None
+    home_spread_odds = away_spread_odds = ''
+    for entry in markets:
+        arr = entry.get(SPREAD_MARKET) if isinstance(entry, dict) else None
+        if not arr or not isinstance(arr, list):
+            continue
+        m = arr[0]
+        value = _to_number(m.get('handicap'))
+        if value is None:
+            value = _to_number(m.get('total'))
+        if value is not None:
+            spread = value
+            home_spread_odds = m.get('home_od') or m.get('home_odds') or m.get('h') or ''
+            away_spread_odds = m.get('away_od') or m.get('away_odds') or m.get('a') or ''
+            break
+
+    if total_line is None:
+        return None
+
+    return {
+        "totalLine": total_line,
+        "overOdds": over_odds,
+        "underOdds": under_odds,
+        "sourceMarket": source_market,
+        "spread": spread if spread is not None else 0,
+        "homeSpreadOdds": home_spread_odds,
+        "awaySpreadOdds": away_spread_odds,
+    }
+
+def fetch_and_extract_odds(url):
+    """Fetch one odds endpoint and normalize it, None on any failure"""
+    return _fetch_odds(url)[1]
+
+def _fetch_odds(url):
+    """(answered, odds): answered is False when the request itself failed"""
+    try:
+        data = get_json(url, max_retries=0)  # the other hedged endpoints are the retry
+    except Exception as e:
+        logger.warning(f"Odds fetch error: {e}")
+        API_ERRORS.inc(source="odds")
+        return False, None
+    try:
+        if data.get('success') == 1 and data.get('results'):
+            return True, normalize_odds(data['results'])
+    except Exception as e:
+        logger.warning(f"Odds parse error: {e}")
+    return True, None
+
+class OddsFetcher:
+    """Hedged concurrent odds lookups with a per-event cache keyed to the game clock"""
+
+    def __init__(self, max_workers=None):
+        from config import ODDS_WORKERS
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or ODDS_WORKERS,
+                                            thread_name_prefix="odds")
+        self._cache = {}     # event id -> (odds, played at fetch, wall time at fetch)
+        self._lock = threading.Lock()
+
+    def get_odds(self, event_id, played=None):
+        """Odds for one event; played is seconds of game clock elapsed, if known"""
+        return self.get_odds_many({event_id: played})[event_id]
+
+    def get_odds_many(self, played_by_event, budget=None):
+        """Odds for several events at once, {event id: played} -> {event id: odds or None}"""
+        results = {}
+        missing = []
+        for event_id, played in played_by_event.items():
+            hit, odds = self._cached(event_id, played)
+            if hit:
+                results[event_id] = odds
+            else:
+                missing.append(event_id)
+
+        if missing:
+            with span("odds"):
+                fetched = self._fetch_hedged(missing, budget)
+            now = time.time()
+            with self._lock:
+                for event_id in missing:
+                    results[event_id] = fetched.get(event_id)
+                    if event_id in fetched:   # unresolved at the deadline is not "no odds"
+                        self._cache[event_id] = (fetched[event_id], played_by_event[event_id], now)
+            self._prune(now)
+        return results
+
+    def forget(self, event_id):
+        """Drop a cached entry, e.g. once a game is released"""
+        with self._lock:
+            self._cache.pop(event_id, None)
+
+    def _cached(self, event_id, played):
+        from config import ODDS_TTL_GAME_SECONDS, ODDS_MAX_AGE, ODDS_NEGATIVE_TTL
+        with self._lock:
+            entry = self._cache.get(event_id)
+        if entry is None:
+            return False, None
+
+        odds, fetched_played, fetched_at = entry
+        age = time.time() - fetched_at
+        if odds is None:
+            return age < ODDS_NEGATIVE_TTL, None
+        if age >= ODDS_MAX_AGE:
+            return False, None
+        if played is not None and fetched_played is not None:
+            if played - fetched_played >= ODDS_TTL_GAME_SECONDS or played < fetched_played:
+                return False, None
+        return True, odds
+
+    def _fetch_hedged(self, event_ids, budget=None):
+        """Race every fallback endpoint per event; first valid result wins, the rest are cancelled
+
+        Returns {event id: odds} for events resolved before the deadline,
+        with None where every endpoint answered without odds. Events that
+        hit the deadline or failed outright are left out.
+        """
+        from config import ODDS_DEADLINE
+
+        owner = {}
+        unanswered = {}   # event id -> endpoints that have not answered "no odds" yet
+        for event_id in event_ids:
+            urls = odds_urls(event_id)
+            unanswered[event_id] = len(urls)
+            for url in urls:
+                owner[self._executor.submit(_fetch_odds, url)] = event_id
+
+        results = {}
+        pending = set(owner)
+        deadline = time.monotonic() + (ODDS_DEADLINE if budget is None else budget.timeout(ODDS_DEADLINE))
+        try:
+            while pending and len(results) < len(event_ids):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning(f"Odds deadline hit with {len(event_ids) - len(results)} events unresolved")
+                    break
+                done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in done:
+                    event_id = owner[future]
+                    answered, odds = future.result()
+                    if event_id in results:
+                        continue
+                    if odds:
+                        results[event_id] = odds
+                        for other in list(pending):
+                            if owner[other] == event_id:
+                                other.cancel()
+                                pending.discard(other)
+                    elif answered:
+                        unanswered[event_id] -= 1
+                        if not unanswered[event_id]:
+                            results[event_id] = None   # confirmed: no endpoint has odds
+        finally:
+            for future in pending:
+                future.cancel()
+        return results
+
+    def _prune(self, now):
+        from config import ODDS_MAX_AGE
+        with self._lock:
+            stale = [k for k, (_, _, fetched_at) in self._cache.items() if now - fetched_at >= ODDS_MAX_AGE]
+            for event_id in stale:
+                del self._cache[event_id]
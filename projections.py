@@ -1,10 +1,192 @@
 """Basketball projections engine - Python port of JavaScript"""
 import statistics
 import logging
+from array import array
+from collections import deque
 from datetime import datetime
+from fractions import Fraction
 
 logger = logging.getLogger(__name__)
 
+MOMENTUM_WINDOW = 5
+MOMENTUM_EPSILON = 0.0005
+EWMA_ALPHA = 0.3      # weight of the newest sample in the EWMA pace
+
+class SampleSeries:
+    """PPS samples in a float64 array, with running sum/count and O(1) recent-window counters"""
+
+    __slots__ = ("samples", "total", "ewma", "_partials", "_recent", "_diffs",
+                 "momentum_ups", "momentum_downs", "trend_ups", "trend_downs", "turns")
+
+    def __init__(self, samples=None):
+        self.samples = array('d')
+        self.total = 0             # running float sum, same as sum(samples)
+        self.ewma = 0.0            # exponentially weighted mean, EWMA_ALPHA on the newest sample
+        self._partials = []        # exact sum as non-overlapping float partials
+        self._recent = deque(maxlen=MOMENTUM_WINDOW)
+        self._diffs = deque(maxlen=MOMENTUM_WINDOW - 1)
+        self.momentum_ups = 0      # diffs > +epsilon in the window
+        self.momentum_downs = 0    # diffs < -epsilon in the window
+        self.trend_ups = 0         # diffs > 0 in the window
+        self.trend_downs = 0       # diffs < 0 in the window
+        self.turns = 0             # direction changes between adjacent diffs
+        for value in samples or ():
+            self.append(value)
+
+    @classmethod
+    def from_buffer(cls, view):
+        """Build from a float64 buffer (e.g. sample_codec.decode_samples) without copying it"""
+        series = cls()
+        for value in view:
+            series._accumulate(value)
+        series.samples = view
+        return series
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __iter__(self):
+        return iter(self.samples)
+
+    def __getitem__(self, index):
+        return self.samples[index]
+
+    def __repr__(self):
+        return f"SampleSeries(count={len(self.samples)}, mean={self.mean()})"
+
+    def append(self, value):
+        """Add a sample and update all running counters"""
+        if not isinstance(self.samples, array):
+            self.samples = array('d', self.samples)  # first write after a zero-copy load
+        self._accumulate(value)
+        self.samples.append(value)
+
+    def _accumulate(self, value):
+        self.ewma = next_ewma(self.ewma, value, len(self._recent))
+        if self._recent:
+            diff = value - self._recent[-1]
+            if len(self._diffs) == self._diffs.maxlen:
+                oldest = self._diffs[0]
+                self._count_diff(oldest, -1)
+                self._count_turn(oldest, self._diffs[1], -1)
+            if self._diffs:
+                self._count_turn(self._diffs[-1], diff, 1)
+            self._diffs.append(diff)
+            self._count_diff(diff, 1)
+
+        self._recent.append(value)
+        self.total += value
+        self._add_partial(value)
+
+    def mean(self):
+        """Exact average of all samples (matches statistics.mean), 0 when empty"""
+        if not self.samples:
+            return 0
+        exact = sum((Fraction(p) for p in self._partials), Fraction(0))
+        return float(exact / len(self.samples))
+
+    def window_full(self):
+        """True once the recent window holds MOMENTUM_WINDOW samples"""
+        return len(self._recent) == MOMENTUM_WINDOW
+
+    def window_range(self):
+        """Max minus min of the recent window"""
+        return max(self._recent) - min(self._recent)
+
+    def to_list(self):
+        """Plain list copy of the samples, for JSON"""
+        return self.samples.tolist()
+
+    def _add_partial(self, x):
+        # Shewchuk summation, as in math.fsum; stays a handful of partials
+        partials = self._partials
+        i = 0
+        for y in partials:
+            if abs(x) < abs(y):
+                x, y = y, x
+            hi = x + y
+            lo = y - (hi - x)
+            if lo:
+                partials[i] = lo
+                i += 1
+            x = hi
+        partials[i:] = [x]
+
+    def _count_diff(self, diff, sign):
+        if diff > MOMENTUM_EPSILON:
+            self.momentum_ups += sign
+        elif diff < -MOMENTUM_EPSILON:
+            self.momentum_downs += sign
+        if diff > 0:
+            self.trend_ups += sign
+        elif diff < 0:
+            self.trend_downs += sign
+
+    def _count_turn(self, first, second, sign):
+        if first != 0 and second != 0 and (first > 0) != (second > 0):
+            self.turns += sign
+
+def next_ewma(previous, value, count):
+    """EWMA after adding value to count earlier samples; works on floats and numpy arrays"""
+    blended = EWMA_ALPHA * value + (1 - EWMA_ALPHA) * previous
+    if isinstance(count, int):
+        return blended if count else value
+    import numpy as np
+    return np.where(count > 0, blended, value)
+
+# name -> fn(engine, pps, mean_pps, ewma_pps) giving full-game points.
+# Plain arithmetic, so one call covers a float or a whole numpy batch.
+PROJECTION_MODELS = {}
+
+def projection_model(name):
+    """Register a projection model under name"""
+    def register(fn):
+        PROJECTION_MODELS[name] = fn
+        return fn
+    return register
+
+@projection_model("raw")
+def _raw_pace(engine, pps, mean_pps, ewma_pps):
+    """Current scoring pace held for the whole game"""
+    return pps * engine.GAME_SECONDS
+
+@projection_model("mean")
+def _sample_mean(engine, pps, mean_pps, ewma_pps):
+    """Average of every sampled pace"""
+    return mean_pps * engine.GAME_SECONDS
+
+@projection_model("ewma")
+def _ewma_pace(engine, pps, mean_pps, ewma_pps):
+    """Sampled pace weighted toward recent ticks"""
+    return ewma_pps * engine.GAME_SECONDS
+
+@projection_model("blended")
+def _blended(engine, pps, mean_pps, ewma_pps):
+    """main.js experimental blend: BLEND_RATIO of raw pace, the rest sample mean"""
+    return (pps * engine.BLEND_RATIO + mean_pps * (1 - engine.BLEND_RATIO)) * engine.GAME_SECONDS
+
+def _momentum_label(ups, downs):
+    if ups >= 3:
+        return "ON_FIRE"
+    if downs >= 3:
+        return "COOLING_OFF"
+    if ups == downs:
+        return "STEADY_PACE"
+    if ups > downs:
+        return "HEATING_UP"
+    return "SLOWING_DOWN"
+
+def _pace_trend_label(range_val, ups, downs, turns):
+    if range_val <= 0.002:
+        return "RELIABLE - Rock Solid"
+    if ups == 4:
+        return "STRONG - Heating Up"
+    if downs == 4:
+        return "CAUTION - Cooling Down"
+    if turns >= 2:
+        return "RISKY - Unpredictable"
+    return "STRONG - Heating Up" if ups > downs else "CAUTION - Cooling Down"
+
 class ProjectionEngine:
     """Main projection calculation engine"""
     
@@ -45,52 +227,40 @@ class ProjectionEngine:
         if not samples or len(samples) < 5:
             return "INSUFFICIENT_DATA"
         
+        if isinstance(samples, SampleSeries):
+            return _momentum_label(samples.momentum_ups, samples.momentum_downs)
+        
         last_5 = samples[-5:]
         diffs = [last_5[i] - last_5[i-1] for i in range(1, len(last_5))]
         
-        ups = sum(1 for d in diffs if d > 0.0005)
-        downs = sum(1 for d in diffs if d < -0.0005)
-        
-        if ups >= 3:
-            return "ON_FIRE"
-        if downs >= 3:
-            return "COOLING_OFF"
-        if ups == downs:
-            return "STEADY_PACE"
-        if ups > downs:
-            return "HEATING_UP"
-        return "SLOWING_DOWN"
+        ups = sum(1 for d in diffs if d > MOMENTUM_EPSILON)
+        downs = sum(1 for d in diffs if d < -MOMENTUM_EPSILON)
+        
+        return _momentum_label(ups, downs)
     
     def classify_pace_trend(self, pps_samples):
         """Classify pace trend reliability"""
         if not pps_samples or len(pps_samples) < 5:
             return "Not enough data"
         
+        if isinstance(pps_samples, SampleSeries):
+            return _pace_trend_label(pps_samples.window_range(), pps_samples.trend_ups,
+                                     pps_samples.trend_downs, pps_samples.turns)
+        
         last_5 = pps_samples[-5:]
         range_val = max(last_5) - min(last_5)
         
-        if range_val <= 0.002:
-            return "RELIABLE - Rock Solid"
-        
         diffs = [last_5[i] - last_5[i-1] for i in range(1, len(last_5))]
         ups = sum(1 for d in diffs if d > 0)
         downs = sum(1 for d in diffs if d < 0)
         
-        if ups == 4:
-            return "STRONG - Heating Up"
-        if downs == 4:
-            return "CAUTION - Cooling Down"
-        
         turns = 0
         for i in range(len(diffs)-1):
             if diffs[i] != 0 and diffs[i+1] != 0:
                 if (diffs[i] > 0) != (diffs[i+1] > 0):
                     turns += 1
         
-        if turns >= 2:
-            return "RISKY - Unpredictable"
-        
-        return "STRONG - Heating Up" if ups > downs else "CAUTION - Cooling Down"
+        return _pace_trend_label(range_val, ups, downs, turns)
     
     def calculate_team_totals(self, game_total, spread):
         """Calculate team totals from game total and spread"""
@@ -133,10 +303,13 @@ class ProjectionEngine:
         if not samples or len(samples) < 5:
             return False
         
+        if isinstance(samples, SampleSeries):
+            return samples.momentum_ups >= 3
+        
         last_5 = samples[-5:]
         diffs = [last_5[i] - last_5[i-1] for i in range(1, len(last_5))]
         
-        ups = sum(1 for d in diffs if d > 0.0005)
+        ups = sum(1 for d in diffs if d > MOMENTUM_EPSILON)
         return ups >= 3
     
     def is_leader_on_fire(self, samples):
@@ -155,7 +328,69 @@ class ProjectionEngine:
         """Project points from average PPS of samples"""
         if not samples:
             return 0
-        avg_pps = statistics.mean(samples)
+        if isinstance(samples, SampleSeries):
+            avg_pps = samples.mean()
+        else:
+            avg_pps = statistics.mean(samples)
         return round(avg_pps * self.GAME_SECONDS, 1)
 
+    def evaluate_models(self, pps, mean_pps, ewma_pps):
+        """Every registered projection model on the same inputs, rounded to 0.1: {name: points}
+
+        Inputs may be floats, sequences or numpy arrays, so callers need not import numpy.
+        """
+        import numpy as np
+        pps, mean_pps, ewma_pps = (np.asarray(x, dtype=np.float64) for x in (pps, mean_pps, ewma_pps))
+        return {name: np.round(model(self, pps, mean_pps, ewma_pps), 1)
+                for name, model in PROJECTION_MODELS.items()}
 
+    def project_batch(self, quarters, minutes, seconds, home_scores, away_scores,
+                      home_sums=None, away_sums=None, total_sums=None, sample_counts=None,
+                      home_ewmas=None, away_ewmas=None, total_ewmas=None):
+        """Vectorized played time, PPS and projections for many games at once
+        
+        The *_sums/*_ewmas/sample_counts arrays describe each game's samples
+        before this tick; *_avg and the models include this tick's PPS as one
+        more sample. Home, away and total are stacked so every projection
+        model runs once per batch, as model_<name>_<side>. Rows with
+        played <= 0 have valid=False and zero PPS/projections.
+        """
+        import numpy as np
+        
+        q = np.asarray(quarters, dtype=np.int64)
+        n = len(q)
+        clock = np.asarray(minutes, dtype=np.int64) * 60 + np.asarray(seconds, dtype=np.int64)
+        home = np.asarray(home_scores, dtype=np.float64)
+        away = np.asarray(away_scores, dtype=np.float64)
+        scores = np.stack([home, away, home + away])
+        
+        regulation = (q - 1) * self.QUARTER_SECONDS + (self.QUARTER_SECONDS - clock)
+        overtime = (4 * self.QUARTER_SECONDS + (q - 5) * self.OT_SECONDS
+                    + (self.OT_SECONDS - clock))
+        played = np.where(q <= 4, regulation, overtime)
+        valid = played > 0
+        divisor = np.where(valid, played, 1)
+        
+        if sample_counts is None:
+            counts = np.zeros(n)
+        else:
+            counts = np.asarray(sample_counts, dtype=np.float64)
+        
+        def stacked(columns):
+            return np.stack([np.zeros(n) if c is None else np.asarray(c, dtype=np.float64) for c in columns])
+        
+        pps = np.where(valid, scores / divisor, 0.0)
+        mean_pps = np.where(valid, (stacked((home_sums, away_sums, total_sums)) + pps) / (counts + 1), 0.0)
+        ewma_pps = np.where(valid, next_ewma(stacked((home_ewmas, away_ewmas, total_ewmas)), pps, counts), 0.0)
+        
+        result = {"played": played, "valid": valid}
+        raw = np.round(pps * self.GAME_SECONDS, 1)
+        avg = np.round(mean_pps * self.GAME_SECONDS, 1)
+        models = self.evaluate_models(pps, mean_pps, ewma_pps)
+        for i, side in enumerate(("home", "away", "total")):
+            result[f"{side}_pps"] = pps[i]
+            result[f"{side}_raw"] = raw[i]
+            result[f"{side}_avg"] = avg[i]
+            for name, values in models.items():
+                result[f"model_{name}_{side}"] = values[i]
+        return result
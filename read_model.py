@@ -0,0 +1,85 @@
+"""Immutable, pre-encoded views of tracked games for the read endpoints"""
+import hashlib
+import logging
+import time
+
+try:
+    import orjson as _json
+except ImportError:   # pragma: no cover - orjson is in requirements.txt
+    import json as _json
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_FIELDS = ("id", "phase", "last_stamp", "betting_window_fired", "decision_complete",
+                  "final_report_sent", "last_alert", "models")
+
+def dumps(obj):
+    """JSON bytes with orjson, or the stdlib fallback"""
+    out = _json.dumps(obj)
+    return out if isinstance(out, bytes) else out.encode()
+
+def etag_for(body):
+    return hashlib.blake2b(body, digest_size=12).hexdigest()
+
+class Entity:
+    """Encoded JSON body and its ETag"""
+
+    __slots__ = ("body", "etag")
+
+    def __init__(self, body):
+        self.body = body
+        self.etag = etag_for(body)
+
+class ProjectionsView:
+    """Everything the read endpoints serve, as of one tick; never mutated after publish"""
+
+    __slots__ = ("version", "published_at", "games_body", "projections", "summary", "games")
+
+    def __init__(self, version, games, summaries):
+        self.version = version
+        self.published_at = time.time()
+        # {event id: game bytes} -> one {"id": game, ...} object, without re-encoding the games
+        self.games_body = b"{" + b",".join(dumps(event_id) + b":" + body for event_id, body in games.items()) + b"}"
+        self.projections = Entity(b'{"ok":true,"tracked_games":' + self.games_body + b"}")
+        self.games = {event_id: Entity(body) for event_id, body in games.items()}
+        # Content only, so the ETag holds across ticks that change nothing
+        self.summary = Entity(dumps({"ok": True, "count": len(summaries), "games": summaries}))
+
+class ReadModel:
+    """Publishes a new ProjectionsView after each tick; readers only ever see whole views
+
+    Sample series are append-only, so each game's encoded samples are
+    cached and only re-encoded after new samples arrive.
+    """
+
+    def __init__(self):
+        self._version = 0
+        self._samples = {}   # event id -> ((home, away, total) series, their lengths, encoded bytes)
+        self.current = ProjectionsView(self._version, {}, [])
+
+    def publish(self, games):
+        """Encode {event id: tracking state} into a fresh view and swap it in; call with ticks paused"""
+        encoded, summaries = {}, []
+        for event_id, tracked in games.items():
+            fields = {k: v for k, v in tracked.items() if k != "samples"}
+            meta = dumps(fields)
+            encoded[event_id] = meta[:-1] + b',"samples":' + self._encoded_samples(event_id, tracked["samples"]) + b"}"
+            summary = {k: tracked.get(k) for k in SUMMARY_FIELDS}
+            summary["sample_count"] = len(tracked["samples"]["total"])
+            summary.update((k, v) for k, v in tracked.items() if k.startswith("experimental_"))
+            summaries.append(summary)
+        for event_id in self._samples.keys() - games.keys():
+            del self._samples[event_id]
+        self._version += 1
+        self.current = ProjectionsView(self._version, encoded, summaries)
+        return self.current
+
+    def _encoded_samples(self, event_id, samples):
+        series = (samples["home"], samples["away"], samples["total"])
+        lengths = tuple(len(x) for x in series)
+        cached = self._samples.get(event_id)
+        if cached and all(a is b for a, b in zip(cached[0], series)) and cached[1] == lengths:
+            return cached[2]
+        body = dumps({"home": series[0].to_list(), "away": series[1].to_list(), "total": series[2].to_list()})
+        self._samples[event_id] = (series, lengths, body)
+        return body
@@ -0,0 +1,53 @@
+"""Packed binary encoding for PPS sample series"""
+import struct
+import sys
+import zlib
+from array import array
+
+# 8-byte header keeps the float64 payload aligned: magic, format, sample count
+HEADER = struct.Struct('<3sBI')
+MAGIC = b'PPS'
+FORMAT_RAW = 0          # little-endian float64 values, loadable without copying
+FORMAT_XOR_DELTA = 1    # zlib(each value's bits XOR the previous value's bits)
+
+def encode_samples(values, delta=False):
+    """Pack float samples into bytes; delta=True trades zero-copy loads for size"""
+    packed = array('d', values)
+    if sys.byteorder != 'little':
+        packed.byteswap()
+
+    if not delta:
+        return HEADER.pack(MAGIC, FORMAT_RAW, len(packed)) + packed.tobytes()
+
+    import numpy as np
+    bits = np.frombuffer(packed, dtype='<u8')
+    xored = bits.copy()
+    xored[1:] ^= bits[:-1]
+    return HEADER.pack(MAGIC, FORMAT_XOR_DELTA, len(packed)) + zlib.compress(xored.tobytes())
+
+def decode_samples(blob):
+    """Float64 view of encoded samples; zero-copy for FORMAT_RAW on little-endian hosts"""
+    view = memoryview(blob)
+    magic, fmt, count = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError("Not an encoded sample series")
+    payload = view[HEADER.size:]
+
+    if fmt == FORMAT_RAW:
+        if len(payload) != count * 8:
+            raise ValueError(f"Sample payload size {len(payload)} does not match count {count}")
+        if sys.byteorder == 'little':
+            return payload.cast('d')
+        values = array('d', payload.tobytes())
+        values.byteswap()
+        return values
+
+    if fmt == FORMAT_XOR_DELTA:
+        import numpy as np
+        xored = np.frombuffer(zlib.decompress(payload), dtype='<u8')
+        if len(xored) != count:
+            raise ValueError(f"Sample payload size {len(xored)} does not match count {count}")
+        bits = np.bitwise_xor.accumulate(xored)
+        return array('d', bits.astype('<u8').view('<f8').astype('=f8').tobytes())
+
+    raise ValueError(f"Unknown sample format {fmt}")
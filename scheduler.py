@@ -0,0 +1,100 @@
+"""In-process adaptive polling of the inplay feed"""
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+FAST_WINDOW_SECONDS = 120   # Q3 clock remaining at which polling speeds up for the Q4 decision
+
+def poll_interval(snapshots, tracker):
+    """Seconds until the next poll, from the phase of the tracked games in this feed"""
+    from config import POLL_FAST_SECONDS, POLL_NORMAL_SECONDS, POLL_SLOW_SECONDS, POLL_IDLE_SECONDS
+
+    if not snapshots:
+        return POLL_IDLE_SECONDS
+
+    interval = POLL_SLOW_SECONDS
+    for snap in snapshots:
+        tracked = tracker.get(snap.event_id)
+        if tracked is None:
+            continue
+        if snap.quarter == 3 and snap.minute * 60 + snap.second <= FAST_WINDOW_SECONDS:
+            return POLL_FAST_SECONDS
+        if snap.quarter == 4 and not tracked["betting_window_fired"]:
+            return POLL_FAST_SECONDS
+        if snap.quarter >= 3:
+            interval = POLL_NORMAL_SECONDS
+    return interval
+
+class PollingScheduler:
+    """Background thread calling tick() again after the delay it returns
+
+    The delay is jittered and the call rate is capped at max_per_minute
+    whatever tick() asks for. Exceptions are logged and retried after
+    error_delay.
+    """
+
+    def __init__(self, tick, max_per_minute, jitter=0.1, error_delay=10.0, name="poller"):
+        self.tick = tick
+        self.max_per_minute = max_per_minute
+        self.jitter = jitter
+        self.error_delay = error_delay
+        self.name = name
+        self.runs = 0
+        self.errors = 0
+        self._recent = deque()   # monotonic start times of calls in the last minute
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start polling; the first tick runs immediately"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+            logger.info(f"Polling scheduler started (max {self.max_per_minute}/min)")
+
+    def stop(self, timeout=30):
+        """Stop after the current tick, waiting up to timeout seconds for it"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                logger.warning("Polling scheduler did not stop in time")
+            self._thread = None
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._stop.wait(self._rate_delay())
+            if self._stop.is_set():
+                break
+
+            self._recent.append(time.monotonic())
+            try:
+                delay = self.tick()
+                self.runs += 1
+            except Exception:
+                logger.exception("Scheduled tick failed")
+                self.errors += 1
+                delay = self.error_delay
+
+            if delay is None:
+                delay = self.error_delay
+            if self.jitter:
+                delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+            self._stop.wait(max(0.0, delay))
+
+    def _rate_delay(self):
+        """Seconds to wait so no more than max_per_minute ticks start in any 60s window"""
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] >= 60:
+            self._recent.popleft()
+        if len(self._recent) < self.max_per_minute:
+            return 0.0
+        return 60 - (now - self._recent[0])
@@ -0,0 +1,281 @@
+"""Game sharding across workers: consistent hashing plus leases in Firestore"""
+import bisect
+import hashlib
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from google.api_core import exceptions as api_exceptions
+
+logger = logging.getLogger(__name__)
+
+WORKERS_COLLECTION = 'workers'
+LEASES_COLLECTION = 'game_leases'
+# Someone else wrote the lease first; anything else is a transient error
+LOST_RACE = (api_exceptions.Conflict, api_exceptions.FailedPrecondition, api_exceptions.NotFound)
+# A lease must outlive this many heartbeats, so one slow or failed renewal does not lose it
+LEASE_TTL_FACTOR = 3
+
+def _hash(key):
+    """Stable 64-bit hash; the builtin hash() differs between processes"""
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big')
+
+def default_worker_id():
+    """WORKER_ID from the environment, else host-pid-random so gunicorn workers differ"""
+    return os.getenv('WORKER_ID') or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+def check_lease_ttl(lease_ttl=None, heartbeat=None):
+    """Raise ValueError unless LEASE_TTL_SECONDS is several heartbeats long
+
+    Leases are renewed by the heartbeat thread, not the tick, so the gap
+    between ticks does not matter here.
+    """
+    from config import LEASE_TTL_SECONDS, HEARTBEAT_SECONDS
+
+    lease_ttl = LEASE_TTL_SECONDS if lease_ttl is None else lease_ttl
+    heartbeat = HEARTBEAT_SECONDS if heartbeat is None else heartbeat
+    if lease_ttl < LEASE_TTL_FACTOR * heartbeat:
+        raise ValueError(f"LEASE_TTL_SECONDS={lease_ttl:g} must be at least {LEASE_TTL_FACTOR}x "
+                         f"HEARTBEAT_SECONDS={heartbeat:g}")
+
+class HashRing:
+    """Consistent hash ring with virtual nodes"""
+
+    def __init__(self, nodes=(), vnodes=64):
+        self.vnodes = vnodes
+        self.nodes = frozenset(nodes)
+        points = sorted((_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(vnodes))
+        self._hashes = [h for h, _ in points]
+        self._owners = [node for _, node in points]
+
+    def node_for(self, key):
+        """Node owning key, or None on an empty ring"""
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, _hash(str(key))) % len(self._hashes)
+        return self._owners[index]
+
+class ShardCoordinator:
+    """Decides which live games this worker may track
+
+    A new game goes to the worker the ring assigns it to, but only once
+    that worker has created its lease document. Leases are sticky:
+    tracking state lives in memory, so a game stays with its holder until
+    it is released. A game only moves when its lease expires without
+    renewal. Leases and worker liveness are renewed by a heartbeat
+    thread (start()), so a long gap between ticks does not let them
+    lapse; each tick only publishes the progress stored on the leases
+    and picks up the leases lost in between. Every write to a lease is
+    conditional on the last update time this worker saw, so two workers
+    can never both believe they hold the same lease.
+    """
+
+    def __init__(self, db, worker_id=None, lease_ttl=None, heartbeat_interval=None, vnodes=None):
+        from config import LEASE_TTL_SECONDS, HEARTBEAT_SECONDS, SHARD_VNODES
+
+        self.db = db
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_ttl = LEASE_TTL_SECONDS if lease_ttl is None else lease_ttl
+        self.heartbeat_interval = HEARTBEAT_SECONDS if heartbeat_interval is None else heartbeat_interval
+        self.vnodes = SHARD_VNODES if vnodes is None else vnodes
+        self.ring = HashRing([self.worker_id], self.vnodes)
+        self.held = {}          # event id -> update time of our last write to its lease
+        self.orphaned = set()   # expired leases of other workers that the ring now gives us
+        self.foreign = {}       # event id -> expiry of a live lease held by another worker
+        self.inherited = {}     # event id -> progress left in a lease we took over
+        self.progress = {}      # event id -> progress written with the next renewal
+        self.lost = set()       # leases lost since the last take_lost()
+        self._last_heartbeat = None
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Renew leases and worker liveness every heartbeat_interval on a background thread"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="shard-heartbeat", daemon=True)
+            self._thread.start()
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def publish(self, progress):
+        """Progress to store on our leases; heartbeats inline when no heartbeat thread runs"""
+        self.progress = progress
+        if not self.running():
+            self.heartbeat()
+
+    def take_lost(self):
+        """Event ids whose lease was lost since the last call"""
+        with self._lock:
+            lost, self.lost = self.lost, set()
+        return lost
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.heartbeat(force=True)
+            except Exception as e:
+                logger.error(f"Shard heartbeat thread error: {e}")
+            self._stop.wait(self.heartbeat_interval)
+
+    def heartbeat(self, progress=None, force=False):
+        """Refresh worker liveness, the ring and our leases; returns event ids whose lease was lost
+
+        progress maps event id -> small dict stored on the lease, handed to
+        whoever takes the game over if this worker dies; without it the
+        last published progress is used. Lost ids are also kept for
+        take_lost().
+        """
+        now = time.time()
+        with self._lock:
+            if not force and self._last_heartbeat is not None and now - self._last_heartbeat < self.heartbeat_interval:
+                return set()
+            self._last_heartbeat = now
+
+            try:
+                self.db.collection(WORKERS_COLLECTION).document(self.worker_id).set(
+                    {"expires_at": now + self.lease_ttl}, merge=True)
+                self._refresh_ring(now)
+            except Exception as e:
+                logger.error(f"Shard heartbeat error: {e}")
+
+            if progress is not None:
+                self.progress = progress
+            progress = self.progress
+            lost = {event_id for event_id in list(self.held)
+                    if not self._write_lease(event_id, now, progress.get(event_id))}
+            for event_id in lost:
+                self.held.pop(event_id, None)
+                logger.warning(f"Lost lease for game {event_id}")
+            self.lost |= lost
+            self._scan_leases(now)
+            return lost
+
+    def owns(self, event_id):
+        return event_id in self.held
+
+    def is_orphaned(self, event_id):
+        """True if another worker's lease on this game expired and the ring gives it to us"""
+        return event_id in self.orphaned
+
+    def claim(self, event_ids, limit=None):
+        """Take leases on the candidates the ring assigns to us; the ids actually acquired"""
+        acquired = []
+        now = time.time()
+        with self._lock:
+            for event_id in event_ids:
+                if limit is not None and len(acquired) >= limit:
+                    break
+                if event_id in self.held:
+                    acquired.append(event_id)
+                    continue
+                if self.ring.node_for(event_id) != self.worker_id:
+                    continue
+                if self.foreign.get(event_id, 0) > now:
+                    continue   # still held elsewhere as of the last scan
+                if self._acquire(event_id, now):
+                    acquired.append(event_id)
+                    self.orphaned.discard(event_id)
+        return acquired
+
+    def release(self, event_id):
+        """Give up a lease, e.g. after the final report"""
+        with self._lock:
+            update_time = self.held.pop(event_id, None)
+            self.orphaned.discard(event_id)
+            self.inherited.pop(event_id, None)
+        if update_time is None:
+            return
+        ref = self.db.collection(LEASES_COLLECTION).document(event_id)
+        try:
+            ref.delete(option=self.db.write_option(last_update_time=update_time))
+        except Exception as e:
+            logger.warning(f"Could not release lease for game {event_id}: {e}")
+
+    def stop(self):
+        """Stop heartbeating, release every lease and leave the ring so other workers take over at once"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(10)
+            self._thread = None
+        for event_id in list(self.held):
+            self.release(event_id)
+        try:
+            self.db.collection(WORKERS_COLLECTION).document(self.worker_id).delete()
+        except Exception as e:
+            logger.warning(f"Could not remove worker {self.worker_id}: {e}")
+
+    def _refresh_ring(self, now):
+        live = {self.worker_id}
+        for doc in self.db.collection(WORKERS_COLLECTION).stream():
+            expires_at = (doc.to_dict() or {}).get("expires_at", 0)
+            if expires_at > now:
+                live.add(doc.id)
+            elif now - expires_at > 10 * self.lease_ttl:
+                doc.reference.delete()   # long-dead worker
+        if live != self.ring.nodes:
+            logger.info(f"Shard ring now has {len(live)} worker(s)")
+            self.ring = HashRing(live, self.vnodes)
+
+    def _scan_leases(self, now):
+        """One read of all leases: which are held elsewhere, and which expired ones fail over to us"""
+        orphaned, foreign = set(), {}
+        try:
+            for doc in self.db.collection(LEASES_COLLECTION).stream():
+                lease = doc.to_dict() or {}
+                if lease.get("owner") == self.worker_id:
+                    continue
+                expires_at = lease.get("expires_at", 0)
+                if expires_at > now:
+                    foreign[doc.id] = expires_at
+                elif self.ring.node_for(doc.id) == self.worker_id:
+                    orphaned.add(doc.id)
+        except Exception as e:
+            logger.error(f"Lease scan error: {e}")
+            return
+        self.orphaned, self.foreign = orphaned, foreign
+
+    def _acquire(self, event_id, now):
+        ref = self.db.collection(LEASES_COLLECTION).document(event_id)
+        lease = {"owner": self.worker_id, "expires_at": now + self.lease_ttl}
+        try:
+            doc = ref.get()
+            if not doc.exists:
+                result = ref.create(lease)
+            else:
+                current = doc.to_dict() or {}
+                if current.get("owner") != self.worker_id and current.get("expires_at", 0) > now:
+                    return False
+                result = ref.update(lease, option=self.db.write_option(last_update_time=doc.update_time))
+                if current.get("owner") != self.worker_id and current.get("progress"):
+                    self.inherited[event_id] = current["progress"]
+        except LOST_RACE as e:
+            logger.info(f"Lease for game {event_id} taken by another worker: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"Lease acquire error for game {event_id}: {e}")
+            return False
+        self.held[event_id] = result.update_time
+        logger.info(f"Acquired lease for game {event_id}")
+        return True
+
+    def _write_lease(self, event_id, now, progress=None):
+        """Extend a held lease; False only if someone else took it"""
+        ref = self.db.collection(LEASES_COLLECTION).document(event_id)
+        fields = {"expires_at": now + self.lease_ttl}
+        if progress:
+            fields["progress"] = progress
+        try:
+            result = ref.update(fields, option=self.db.write_option(last_update_time=self.held[event_id]))
+        except LOST_RACE as e:
+            logger.info(f"Lease renewal for game {event_id} rejected: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"Lease renewal error for game {event_id}, retrying next heartbeat: {e}")
+            return True
+        self.held[event_id] = result.update_time
+        return True
@@ -0,0 +1,229 @@
+"""Snapshots of in-memory tracking state, so a restarted instance resumes where it stopped
+
+Each worker writes its own snapshot, keyed by its shard worker id, so
+gunicorn workers and instances never overwrite each other. On startup
+a worker reads all of them and takes back the games its shard lets it
+claim.
+"""
+import glob
+import json
+import logging
+import os
+import struct
+import tempfile
+import time
+from projections import SampleSeries
+from sample_codec import encode_samples, decode_samples
+
+logger = logging.getLogger(__name__)
+
+# Little-endian, 8-byte aligned: magic, format version, game count, saved-at wall time
+HEADER = struct.Struct('<3sBId')
+MAGIC = b'TRK'
+VERSION = 1
+# Per game: byte lengths of the JSON fields and of the home, away and total sample blobs
+RECORD = struct.Struct('<4I')
+SIDES = ("home", "away", "total")
+
+def _pad(length):
+    return -length % 8
+
+def encode_snapshot(games, saved_at=None):
+    """Pack {event id: tracking state} into one blob; samples use sample_codec's raw format"""
+    parts = [HEADER.pack(MAGIC, VERSION, len(games), time.time() if saved_at is None else saved_at)]
+    for tracked in games.values():
+        fields = {k: v for k, v in tracked.items() if k != "samples"}
+        fields["fingerprint"] = None   # hash() of strings differs between processes
+        meta = json.dumps(fields, separators=(",", ":")).encode()
+        blobs = [encode_samples(tracked["samples"][side]) for side in SIDES]
+        parts.append(RECORD.pack(len(meta), *(len(blob) for blob in blobs)))
+        for chunk in (meta, *blobs):
+            parts.append(chunk)
+            parts.append(b'\0' * _pad(len(chunk)))
+    return b''.join(parts)
+
+def decode_snapshot(blob):
+    """(saved_at, {event id: tracking state}); samples are zero-copy views into blob"""
+    view = memoryview(blob)
+    magic, version, count, saved_at = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError("Not a tracker snapshot")
+    if version != VERSION:
+        raise ValueError(f"Unsupported snapshot version {version}")
+
+    games = {}
+    offset = HEADER.size
+    for _ in range(count):
+        meta_len, *blob_lens = RECORD.unpack_from(view, offset)
+        offset += RECORD.size
+        tracked = json.loads(bytes(view[offset:offset + meta_len]))
+        offset += meta_len + _pad(meta_len)
+        tracked["samples"] = {}
+        for side, length in zip(SIDES, blob_lens):
+            tracked["samples"][side] = SampleSeries.from_buffer(decode_samples(view[offset:offset + length]))
+            offset += length + _pad(length)
+        games[tracked["id"]] = tracked
+    return saved_at, games
+
+class FileBackend:
+    """Snapshots as local files <path>.<key>, one per worker, each replaced atomically
+
+    Under /tmp they survive a worker restart but not a Cloud Run instance
+    being recycled; use the gcs backend for that.
+    """
+
+    def __init__(self, path, key):
+        self.path = path
+        self.key = key
+
+    def read_all(self):
+        """{key: blob} for every worker's snapshot"""
+        blobs = {}
+        for path in glob.glob(glob.escape(self.path) + '.*'):
+            try:
+                with open(path, 'rb') as f:
+                    blobs[path[len(self.path) + 1:]] = f.read()
+            except FileNotFoundError:
+                continue
+        return blobs
+
+    def write(self, data):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.snapshot-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, f"{self.path}.{self.key}")
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def delete(self, key):
+        try:
+            os.unlink(f"{self.path}.{key}")
+        except FileNotFoundError:
+            pass
+
+class GCSBackend:
+    """Snapshots as Cloud Storage objects <name>.<key>, one per worker"""
+
+    def __init__(self, bucket, name, key, project=None):
+        from google.cloud import storage
+
+        self.bucket = storage.Client(project=project).bucket(bucket)
+        self.name = name
+        self.key = key
+
+    def read_all(self):
+        """{key: blob} for every worker's snapshot"""
+        from google.api_core.exceptions import NotFound
+
+        blobs = {}
+        for blob in self.bucket.list_blobs(prefix=self.name + '.'):
+            try:
+                blobs[blob.name[len(self.name) + 1:]] = blob.download_as_bytes()
+            except NotFound:
+                continue
+        return blobs
+
+    def write(self, data):
+        self.bucket.blob(f"{self.name}.{self.key}").upload_from_string(data, content_type='application/octet-stream')
+
+    def delete(self, key):
+        from google.api_core.exceptions import NotFound
+
+        try:
+            self.bucket.blob(f"{self.name}.{key}").delete()
+        except NotFound:
+            pass
+
+def make_backend(kind=None, key=None):
+    """Backend named by SNAPSHOT_BACKEND ('file' or 'gcs'), or None when snapshots are off
+
+    key names this worker's snapshot (the shard worker id); without
+    sharding there is one worker, and WORKER_ID or 'tracker' is used.
+    """
+    from config import SNAPSHOT_BACKEND, SNAPSHOT_PATH, SNAPSHOT_OBJECT, GCS_BUCKET, GCS_PROJECT
+
+    kind = SNAPSHOT_BACKEND if kind is None else kind
+    key = key or os.getenv('WORKER_ID') or 'tracker'
+    if not kind:
+        return None
+    if kind == 'file':
+        return FileBackend(SNAPSHOT_PATH, key)
+    if kind == 'gcs':
+        return GCSBackend(GCS_BUCKET, SNAPSHOT_OBJECT, key, GCS_PROJECT)
+    raise ValueError(f"Unknown SNAPSHOT_BACKEND {kind!r}")
+
+class TrackerSnapshots:
+    """Saves a GameTracker's games to a backend every interval seconds and restores them on startup"""
+
+    def __init__(self, backend, tracker, interval=None, max_age=None):
+        from config import SNAPSHOT_SECONDS, SNAPSHOT_MAX_AGE
+
+        self.backend = backend
+        self.tracker = tracker
+        self.interval = SNAPSHOT_SECONDS if interval is None else interval
+        self.max_age = SNAPSHOT_MAX_AGE if max_age is None else max_age
+        self.last_saved = time.monotonic()
+
+    def save(self):
+        """Write the current games; False if the backend failed"""
+        start = time.perf_counter()
+        try:
+            data = encode_snapshot(self.tracker.games)
+            self.backend.write(data)
+        except Exception as e:
+            logger.error(f"Snapshot save error: {e}")
+            return False
+        self.last_saved = time.monotonic()
+        logger.info(f"Saved snapshot of {len(self.tracker)} game(s), {len(data)} bytes "
+                    f"in {time.perf_counter() - start:.3f}s")
+        return True
+
+    def maybe_save(self):
+        """Save if the last snapshot is older than interval"""
+        if time.monotonic() - self.last_saved >= self.interval:
+            return self.save()
+        return False
+
+    def restore(self):
+        """One bulk read of every worker's snapshot into the tracker; the event ids restored
+
+        Snapshots older than max_age are ignored and deleted. A game in
+        several snapshots comes from the newest one; the tracker claims
+        each game through its shard, so games another live worker holds
+        stay there.
+        """
+        try:
+            blobs = self.backend.read_all()
+        except Exception as e:
+            logger.error(f"Snapshot restore error: {e}")
+            return []
+
+        now = time.time()
+        newest = {}   # event id -> (saved_at, tracking state)
+        for key, blob in blobs.items():
+            try:
+                saved_at, games = decode_snapshot(blob)
+            except Exception as e:
+                logger.error(f"Unreadable snapshot {key!r}: {e}")
+                continue
+            if now - saved_at > self.max_age:
+                logger.info(f"Removing snapshot {key!r} from {now - saved_at:.0f}s ago (max {self.max_age:.0f}s)")
+                self._delete(key)
+                continue
+            for event_id, tracked in games.items():
+                if event_id not in newest or saved_at > newest[event_id][0]:
+                    newest[event_id] = (saved_at, tracked)
+        if not newest:
+            return []
+        restored = self.tracker.restore({event_id: tracked for event_id, (_, tracked) in newest.items()})
+        logger.info(f"Restored {len(restored)} of {len(newest)} game(s) from {len(blobs)} snapshot(s)")
+        return restored
+
+    def _delete(self, key):
+        try:
+            self.backend.delete(key)
+        except Exception as e:
+            logger.warning(f"Could not remove snapshot {key!r}: {e}")
@@ -0,0 +1,83 @@
+"""Import-time budget check for cold starts
+
+    python startup_budget.py            # check every module against its budget
+    python startup_budget.py --runs 5   # median of more fresh interpreters
+
+Each module is imported in a fresh interpreter with -X importtime.
+Exits with status 1 if a module goes over its budget, or if importing
+main pulls in a dependency that should load lazily.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+# Cumulative import time per module, milliseconds
+BUDGETS_MS = {
+    "main": 350,
+    "api_client": 200,
+    "discord_client": 160,
+    "odds_client": 200,
+    "projections": 20,
+    "game_tracker": 25,
+    "game_processor": 180,
+    "game_state": 60,
+    "csv_logger": 20,
+    "utils": 10,
+    "feed": 30,
+    "metrics": 10,
+    "scheduler": 10,
+}
+
+# Heavy dependencies main must not import until they are used
+LAZY_FROM_MAIN = ("google.cloud.firestore", "numpy", "pytz")
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s*(\S+)")
+
+def import_time_ms(module):
+    """Cumulative import time of module in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=HERE, capture_output=True, text=True, env={**os.environ, "PYTHONPATH": HERE})
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    for line in reversed(result.stderr.splitlines()):
+        match = _LINE.match(line)
+        if match and match.group(3) == module:
+            return int(match.group(2)) / 1000
+    raise RuntimeError(f"No importtime line for {module}")
+
+def eager_imports(module, names):
+    """Which of names are in sys.modules right after importing module"""
+    code = f"import sys, {module}; print(' '.join(n for n in {names!r} if n in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=HERE, capture_output=True, text=True,
+                            env={**os.environ, "PYTHONPATH": HERE})
+    return result.stdout.split()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters per module")
+    args = parser.parse_args()
+
+    failures = []
+    for module, budget in BUDGETS_MS.items():
+        elapsed = statistics.median(import_time_ms(module) for _ in range(args.runs))
+        over = elapsed > budget
+        if over:
+            failures.append(module)
+        print(f"{module:<16} {elapsed:>8.1f} ms  (budget {budget} ms){'  OVER' if over else ''}")
+
+    eager = eager_imports("main", LAZY_FROM_MAIN)
+    if eager:
+        failures.append("main")
+        print(f"main imports {', '.join(eager)} at load; these should load on first use")
+
+    if failures:
+        print(f"{len(set(failures))} module(s) over budget")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
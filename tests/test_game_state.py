@@ -0,0 +1,187 @@
+"""GameStateManager dirty-field writes and batching, against fakes.InMemoryFirestore"""
+from fakes import InMemoryFirestore
+from game_state import GameStateManager, TrackedState, BINARY_SUFFIX
+from projections import SampleSeries
+from sample_codec import decode_samples
+
+
+class FlakyFirestore(InMemoryFirestore):
+    """Fails the next `failures` batch commits"""
+
+    def __init__(self, failures=1):
+        super().__init__()
+        self.failures = failures
+
+    def batch(self):
+        batch = super().batch()
+        commit = batch.commit
+
+        def flaky_commit(retry=None, timeout=None):
+            if self.failures:
+                self.failures -= 1
+                raise RuntimeError("commit failed")
+            return commit(retry, timeout)
+
+        batch.commit = flaky_commit
+        return batch
+
+
+def stored(db, game_id):
+    return db.collection('game_states').document(game_id).get().to_dict()
+
+
+def make_manager(db=None):
+    return GameStateManager("test", db=db or InMemoryFirestore())
+
+
+def test_first_save_writes_every_field():
+    mgr = make_manager()
+    state = mgr.get_state("g1")
+    assert isinstance(state, TrackedState)
+    mgr.save_state("g1", state)
+    doc = stored(mgr.db, "g1")
+    assert doc["game_id"] == "g1"
+    assert "home_samples_bin" in doc and "home_samples" not in doc
+
+
+def test_only_dirty_fields_are_written():
+    mgr = make_manager()
+    state = mgr.get_state("g1")
+    mgr.save_state("g1", state)
+
+    state["last_home_score"] = 12
+    state["last_away_score"] = 0           # unchanged value, not dirty
+    state["total_samples"].append(0.1)
+    assert set(state.changes()) == {"last_home_score", "total_samples" + BINARY_SUFFIX}
+
+    mgr.save_state("g1", state)
+    assert not state.has_unsaved()
+    assert state.changes() == {}
+    doc = stored(mgr.db, "g1")
+    assert doc["last_home_score"] == 12
+    assert list(decode_samples(doc["total_samples_bin"])) == [0.1]
+
+
+def test_clean_state_is_not_written():
+    mgr = make_manager()
+    state = mgr.get_state("g1")
+    mgr.save_state("g1", state)
+    commits = mgr.db.commits
+    assert mgr.save_state("g1", state)
+    assert mgr.db.commits == commits
+
+
+def test_batch_coalesces_saves_into_one_commit():
+    mgr = make_manager()
+    states = {game_id: mgr.get_state(game_id) for game_id in ("g1", "g2", "g3")}
+    commits = mgr.db.commits
+    with mgr.batched():
+        for score in range(5):
+            for game_id, state in states.items():
+                state["last_home_score"] = score
+                mgr.save_state(game_id, state)
+        assert mgr.db.commits == commits   # nothing written until the block ends
+    assert mgr.db.commits == commits + 1
+    for game_id in states:
+        assert stored(mgr.db, game_id)["last_home_score"] == 4
+
+
+def test_failed_commit_is_requeued_and_newer_values_win():
+    mgr = make_manager(FlakyFirestore(failures=1))
+    state = mgr.get_state("g1")
+    with mgr.batched():
+        state["last_home_score"] = 10
+        state["last_away_score"] = 8
+        mgr.save_state("g1", state)
+    assert stored(mgr.db, "g1") is None
+
+    with mgr.batched():
+        state["last_home_score"] = 14
+        mgr.save_state("g1", state)
+    doc = stored(mgr.db, "g1")
+    assert doc["last_home_score"] == 14    # newer value, not the requeued 10
+    assert doc["last_away_score"] == 8     # only in the failed commit
+    assert doc["game_id"] == "g1"
+
+
+def test_legacy_arrays_are_migrated_and_deleted():
+    db = InMemoryFirestore()
+    db.collection('game_states').document("g1").set({
+        "game_id": "g1",
+        "home_samples": [0.1, 0.2],
+        "away_samples": [0.05],
+        "total_samples": [0.15, 0.25],
+        "last_home_score": 3,
+    })
+    mgr = make_manager(db)
+    state = mgr.get_state("g1")
+    assert isinstance(state["home_samples"], SampleSeries)
+    assert list(state["total_samples"]) == [0.15, 0.25]
+    assert state.has_unsaved()
+
+    mgr.save_state("g1", state)
+    doc = stored(db, "g1")
+    for field in ("home_samples", "away_samples", "total_samples"):
+        assert field not in doc
+    assert list(decode_samples(doc["home_samples_bin"])) == [0.1, 0.2]
+    assert doc["last_home_score"] == 3
+    assert not state.has_unsaved()
+
+
+def test_binary_samples_round_trip_through_a_fresh_manager():
+    db = InMemoryFirestore()
+    mgr = make_manager(db)
+    state = mgr.get_state("g1")
+    for value in (0.1, 0.2, 0.3):
+        state["home_samples"].append(value)
+    mgr.save_state("g1", state)
+
+    reloaded = make_manager(db).get_state("g1")
+    assert list(reloaded["home_samples"]) == [0.1, 0.2, 0.3]
+    assert not reloaded.has_unsaved()
+
+
+class SlowFirestore(InMemoryFirestore):
+    """Reads time out once `timeout` is below `latency`, like a degraded Firestore"""
+
+    def __init__(self, latency):
+        super().__init__()
+        self.latency = latency
+        self.timeouts = []
+
+    def collection(self, name):
+        collection = super().collection(name)
+        document = collection.document
+
+        def slow_document(doc_id):
+            reference = document(doc_id)
+            get = reference.get
+
+            def timed_get(retry=None, timeout=None):
+                self.timeouts.append(timeout)
+                if timeout is None or timeout < self.latency:
+                    raise TimeoutError("deadline exceeded")
+                return get()
+
+            reference.get = timed_get
+            return reference
+
+        collection.document = slow_document
+        return collection
+
+
+def test_state_read_is_bounded_by_the_tick_budget():
+    from budget import TickBudget
+
+    db = SlowFirestore(latency=2.0)
+    db.collection('game_states').document("g1").set({"game_id": "g1", "last_home_score": 7})
+    mgr = make_manager(db)
+
+    budget = TickBudget(0.8, reserve=0)
+    state = mgr.get_state("g1", budget)
+    assert db.timeouts[-1] <= 0.8
+    assert state["last_home_score"] == 0     # fresh state instead of blocking
+
+    state = mgr.get_state("g1")
+    assert db.timeouts[-1] == 5.0
+    assert state["last_home_score"] == 7
@@ -0,0 +1,127 @@
+"""Lifecycle transitions, the timing wheel, and GameTracker expiry"""
+from feed import GameSnapshot
+from game_tracker import GameTracker
+from lifecycle import (RESERVED, SAMPLING, ALERTING, DECIDED, FINAL, STALLED, GONE, TERMINAL,
+                       TimingWheel, transition)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def snap(event_id, quarter, minute=5, second=0, home=0, away=0):
+    return GameSnapshot(event_id, "Home", "Away", quarter, minute, second, home, away,
+                        (quarter, minute, second, home, away))
+
+
+def make_tracker(clock):
+    return GameTracker(10, stall_seconds=240, gone_seconds=180, clock=clock)
+
+
+def test_allowed_and_refused_transitions():
+    tracked = {"id": "g1", "phase": RESERVED}
+    assert transition(tracked, SAMPLING)
+    assert transition(tracked, SAMPLING)          # same phase is a no-op
+    assert transition(tracked, ALERTING)
+    assert not transition(tracked, STALLED)       # only Q1/Q2 games stall
+    assert tracked["phase"] == ALERTING
+    assert transition(tracked, DECIDED)
+    assert not transition(tracked, SAMPLING)
+    assert transition(tracked, FINAL)
+    assert not transition(tracked, GONE)
+    assert TERMINAL == {FINAL, STALLED, GONE}
+
+
+def test_timing_wheel_fires_due_keys_only():
+    wheel = TimingWheel(tick_seconds=1.0, slots=8)
+    wheel.schedule("a", 3.0)
+    wheel.schedule("b", 5.5)
+    wheel.schedule("c", 20.0)                     # more than one turn out
+    assert wheel.advance(2.9) == []
+    assert wheel.advance(3.0) == ["a"]
+    assert wheel.advance(10.0) == ["b"]
+    assert "c" in wheel and len(wheel) == 1
+    assert wheel.advance(19.9) == []
+    assert wheel.advance(25.0) == ["c"]
+    assert len(wheel) == 0
+
+
+def test_timing_wheel_reschedule_and_cancel():
+    wheel = TimingWheel(tick_seconds=1.0, slots=8)
+    wheel.schedule("a", 3.0)
+    wheel.schedule("a", 6.0)                      # pushed back
+    wheel.schedule("b", 4.0)
+    wheel.cancel("b")
+    assert wheel.advance(5.0) == []
+    assert wheel.advance(6.0) == ["a"]
+
+
+def test_q2_game_with_frozen_clock_stalls():
+    clock = Clock()
+    tracker = make_tracker(clock)
+    assert tracker.select_new_games({"g1": snap("g1", 2)}) == ["g1"]
+    tracker.observe("g1", snap("g1", 2, 4, 0), clock_moved=True)
+    assert tracker.get("g1")["phase"] == SAMPLING
+
+    clock.now = 100.0
+    tracker.observe("g1", snap("g1", 2, 4, 0), clock_moved=False)
+    clock.now = 241.0
+    [(event_id, phase, _)] = tracker.expire()
+    assert (event_id, phase) == ("g1", STALLED)
+    assert "g1" not in tracker and "g1" in tracker.stalled
+
+
+def test_alerting_game_in_long_stoppage_is_kept():
+    clock = Clock()
+    tracker = make_tracker(clock)
+    tracker.select_new_games({"g1": snap("g1", 2)})
+    tracker.observe("g1", snap("g1", 3, 4, 0), clock_moved=True)
+    assert tracker.get("g1")["phase"] == ALERTING
+
+    for t in range(60, 600, 60):                  # in the feed, clock frozen
+        clock.now = float(t)
+        tracker.observe("g1", snap("g1", 3, 4, 0), clock_moved=False)
+        assert tracker.expire() == []
+    assert tracker.get("g1")["phase"] == ALERTING
+
+
+def test_game_missing_from_feed_goes():
+    clock = Clock()
+    tracker = make_tracker(clock)
+    tracker.select_new_games({"g1": snap("g1", 1)})
+    clock.now = 181.0
+    [(event_id, phase, _)] = tracker.expire()
+    assert (event_id, phase) == ("g1", GONE)
+    assert len(tracker) == 0
+
+
+class TakeoverShard:
+    """Hands every orphaned game to this worker with the progress its old owner left"""
+
+    def __init__(self, inherited):
+        self.inherited = dict(inherited)
+
+    def is_orphaned(self, event_id):
+        return event_id in self.inherited
+
+    def claim(self, event_ids, limit=None):
+        return list(event_ids)[:limit]
+
+    def release(self, event_id):
+        pass
+
+
+def test_taken_over_alerting_game_does_not_stall():
+    clock = Clock()
+    tracker = GameTracker(10, shard=TakeoverShard({"g1": {"phase": ALERTING}}),
+                          stall_seconds=240, gone_seconds=180, clock=clock)
+    assert tracker.select_new_games({"g1": snap("g1", 3)}) == ["g1"]
+    for t in range(60, 600, 60):                  # a long Q3 timeout
+        clock.now = float(t)
+        tracker.observe("g1", snap("g1", 3), clock_moved=False)
+        assert tracker.expire() == []
+    assert tracker.get("g1")["phase"] == ALERTING
@@ -0,0 +1,66 @@
+"""SampleSeries running counters against the list-based reference paths"""
+import random
+import statistics
+
+import pytest
+
+from projections import ProjectionEngine, SampleSeries, EWMA_ALPHA
+
+
+def random_walk(n, seed):
+    rng = random.Random(seed)
+    value, out = 0.15, []
+    for _ in range(n):
+        value += rng.choice((-0.002, -0.0004, 0.0, 0.0004, 0.002, 0.01))
+        out.append(value)
+    return out
+
+
+def test_empty_series():
+    series = SampleSeries()
+    assert len(series) == 0
+    assert series.mean() == 0
+    assert series.to_list() == []
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_sum_and_mean_match_statistics(seed):
+    values = random_walk(200, seed)
+    series = SampleSeries(values)
+    assert series.to_list() == values
+    assert series.total == pytest.approx(sum(values))
+    assert series.mean() == statistics.mean(values)     # exact, not approximately
+
+
+def test_ewma_weights_newest_sample():
+    series = SampleSeries()
+    series.append(1.0)
+    assert series.ewma == 1.0                           # first sample seeds the EWMA
+    series.append(2.0)
+    assert series.ewma == pytest.approx(EWMA_ALPHA * 2.0 + (1 - EWMA_ALPHA) * 1.0)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_window_counters_match_list_analysis(seed):
+    engine = ProjectionEngine()
+    values = random_walk(40, seed)
+    series = SampleSeries()
+    for i, value in enumerate(values, 1):
+        series.append(value)
+        prefix = values[:i]
+        assert engine.analyze_momentum(series) == engine.analyze_momentum(prefix)
+        assert engine.classify_pace_trend(series) == engine.classify_pace_trend(prefix)
+        assert engine.is_accelerating(series) == engine.is_accelerating(prefix)
+
+
+def test_from_buffer_keeps_counters_and_copies_on_write():
+    values = random_walk(12, 1)
+    source = SampleSeries(values)
+    loaded = SampleSeries.from_buffer(memoryview(source.samples))
+    assert loaded.total == source.total
+    assert loaded.ewma == source.ewma
+    assert (loaded.momentum_ups, loaded.momentum_downs, loaded.turns) == \
+        (source.momentum_ups, source.momentum_downs, source.turns)
+
+    loaded.append(0.5)
+    assert len(loaded) == 13 and len(source) == 12      # the buffer it came from is untouched
@@ -0,0 +1,41 @@
+"""Packed sample encoding: raw and XOR-delta round trips"""
+import random
+
+import pytest
+
+from sample_codec import HEADER, encode_samples, decode_samples
+
+
+VALUES = [0.0, 0.15, 0.1523, -1.5, 1e-300, 123456.789] + [random.Random(3).random() for _ in range(100)]
+
+
+@pytest.mark.parametrize("delta", [False, True])
+def test_round_trip(delta):
+    blob = encode_samples(VALUES, delta)
+    assert list(decode_samples(blob)) == VALUES
+
+
+@pytest.mark.parametrize("delta", [False, True])
+def test_empty(delta):
+    assert list(decode_samples(encode_samples([], delta))) == []
+
+
+def test_raw_layout_is_aligned_and_zero_copy():
+    blob = encode_samples(VALUES)
+    assert HEADER.size == 8
+    assert len(blob) == HEADER.size + 8 * len(VALUES)
+    view = decode_samples(blob)
+    assert isinstance(view, memoryview)                 # a view into blob, not a copy
+
+
+def test_delta_is_smaller_for_slowly_changing_series():
+    values = [0.15 + i * 1e-6 for i in range(500)]
+    assert len(encode_samples(values, delta=True)) < len(encode_samples(values))
+
+
+@pytest.mark.parametrize("blob", [b"XYZ\x00" + bytes(4),                  # bad magic
+                                  encode_samples([1.0, 2.0])[:-8],        # truncated payload
+                                  b"PPS\x07" + bytes(4)])                 # unknown format
+def test_rejects_bad_input(blob):
+    with pytest.raises(ValueError):
+        decode_samples(blob)
@@ -0,0 +1,99 @@
+"""Tracker snapshot encoding, per-worker restore, and restored games' expiry"""
+import time
+
+import pytest
+
+from fakes import InMemorySnapshotBackend
+from game_tracker import GameTracker
+from lifecycle import SAMPLING, ALERTING, DECIDED, FINAL
+from projections import SampleSeries
+from snapshot import TrackerSnapshots, encode_snapshot, decode_snapshot
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def tracked_game(event_id, phase, stamp="2-4-00", samples=(0.1, 0.2, 0.3)):
+    return {
+        "id": event_id,
+        "phase": phase,
+        "last_stamp": stamp,
+        "fingerprint": 12345,
+        "betting_window_fired": phase == DECIDED,
+        "samples": {side: SampleSeries(samples) for side in ("home", "away", "total")},
+    }
+
+
+def make_tracker(clock=None):
+    return GameTracker(10, stall_seconds=240, gone_seconds=180, clock=clock or Clock())
+
+
+def test_encode_decode_round_trip():
+    games = {"g1": tracked_game("g1", SAMPLING), "g2": tracked_game("g2", ALERTING, samples=())}
+    saved_at, decoded = decode_snapshot(encode_snapshot(games, saved_at=1234.5))
+    assert saved_at == 1234.5
+    assert set(decoded) == {"g1", "g2"}
+    assert decoded["g1"]["phase"] == SAMPLING
+    assert decoded["g1"]["fingerprint"] is None       # hash() differs between processes
+    assert list(decoded["g1"]["samples"]["total"]) == [0.1, 0.2, 0.3]
+    assert decoded["g1"]["samples"]["total"].total == pytest.approx(0.6)
+    assert len(decoded["g2"]["samples"]["home"]) == 0
+
+
+def test_decode_rejects_other_data():
+    with pytest.raises(ValueError):
+        decode_snapshot(b"NOPE" + bytes(12))
+
+
+def test_restore_merges_every_workers_snapshot():
+    blobs = {}
+    for key, games in (("a", {"g1": tracked_game("g1", SAMPLING)}),
+                       ("b", {"g2": tracked_game("g2", ALERTING), "g3": tracked_game("g3", FINAL)})):
+        tracker = make_tracker()
+        tracker.games.update(games)
+        TrackerSnapshots(InMemorySnapshotBackend(key, blobs), tracker).save()
+    assert set(blobs) == {"a", "b"}
+
+    tracker = make_tracker()
+    restored = TrackerSnapshots(InMemorySnapshotBackend("c", blobs), tracker).restore()
+    assert sorted(restored) == ["g1", "g2"]           # finished games stay finished
+    assert list(tracker.get("g2")["samples"]["home"]) == [0.1, 0.2, 0.3]
+
+
+def test_restore_prefers_newest_copy_and_drops_old_snapshots():
+    old = encode_snapshot({"g1": tracked_game("g1", SAMPLING)}, saved_at=time.time() - 60)
+    new = encode_snapshot({"g1": tracked_game("g1", ALERTING)}, saved_at=time.time())
+    stale = encode_snapshot({"g9": tracked_game("g9", SAMPLING)}, saved_at=time.time() - 10000)
+    blobs = {"a": old, "b": new, "dead": stale}
+
+    tracker = make_tracker()
+    restored = TrackerSnapshots(InMemorySnapshotBackend("c", blobs), tracker, max_age=600).restore()
+    assert restored == ["g1"]
+    assert tracker.get("g1")["phase"] == ALERTING
+    assert "dead" not in blobs
+
+
+@pytest.mark.parametrize("phase", [ALERTING, DECIDED])
+def test_restored_late_game_survives_a_long_break(phase):
+    clock = Clock()
+    tracker = make_tracker(clock)
+    assert tracker.restore({"g1": tracked_game("g1", phase, stamp="4-3-00")}) == ["g1"]
+    assert ("g1", "stall") not in tracker.timers
+    clock.now = 300.0                                 # frozen past stall_seconds, still in the feed
+    tracker.timers.schedule(("g1", "gone"), clock.now + tracker.gone_seconds)
+    assert tracker.expire() == []
+    assert tracker.get("g1")["phase"] == phase
+
+
+def test_restored_q2_game_can_still_stall():
+    clock = Clock()
+    tracker = make_tracker(clock)
+    tracker.restore({"g1": tracked_game("g1", SAMPLING)})
+    clock.now = 241.0
+    [(event_id, _, _)] = tracker.expire()
+    assert event_id == "g1" and "g1" not in tracker
@@ -0,0 +1,100 @@
+"""Tick store writes, memory-mapped reads, crash recovery and multi-process appends"""
+import multiprocessing
+import os
+
+import numpy as np
+
+from tick_store import COLUMNS, INDEX_FILE, TickStore, TickWriter
+
+
+def write_game(writer, event_id, count, start_ts, quarter=2):
+    for i in range(count):
+        writer.append(event_id, quarter, 4, i % 60, i, i + 1, 0.1, 0.2, 0.3, ts=start_ts + i)
+
+
+def test_write_and_read_back(tmp_path):
+    writer = TickWriter(str(tmp_path), flush_rows=1000)
+    write_game(writer, "101", 5, 1000.0)
+    write_game(writer, "202", 3, 2000.0)
+    writer.close_game("101")
+    writer.flush()
+
+    store = TickStore(str(tmp_path))
+    assert len(store) == 8
+    assert store.events().tolist() == [101, 202]
+    game = store.game(101)
+    assert game["ts"].tolist() == [1000.0 + i for i in range(5)]
+    assert game["clock"].tolist() == [240 + i for i in range(5)]
+    assert game["home"].tolist() == list(range(5))
+    assert isinstance(game["ts"], np.memmap)            # one chunk: zero-copy view
+    assert len(store.game(999)["ts"]) == 0
+
+
+def test_game_across_chunks_and_time_range(tmp_path):
+    writer = TickWriter(str(tmp_path), flush_rows=4)    # forces several chunks
+    write_game(writer, "101", 10, 1000.0)
+    writer.flush()
+
+    store = TickStore(str(tmp_path))
+    assert len(store.chunks(101)) > 1
+    assert store.game(101)["ts"].tolist() == [1000.0 + i for i in range(10)]
+    assert store.time_range(1003.0, 1006.0)["ts"].tolist() == [1003.0, 1004.0, 1005.0]
+    assert store.time_range(5000.0, 6000.0)["ts"].tolist() == []
+
+
+def test_reopen_appends_after_existing_chunks(tmp_path):
+    writer = TickWriter(str(tmp_path))
+    write_game(writer, "101", 3, 1000.0)
+    writer.flush()
+    writer = TickWriter(str(tmp_path))
+    write_game(writer, "202", 2, 2000.0)
+    writer.flush()
+
+    store = TickStore(str(tmp_path))
+    assert store.game(101)["ts"].tolist() == [1000.0, 1001.0, 1002.0]
+    assert store.game(202)["ts"].tolist() == [2000.0, 2001.0]
+
+
+def test_unindexed_tail_from_a_crash_is_overwritten(tmp_path):
+    writer = TickWriter(str(tmp_path))
+    write_game(writer, "101", 3, 1000.0)
+    writer.flush()
+    # A crash after writing column data but before the index record
+    for name, dtype, _ in COLUMNS:
+        with open(tmp_path / f"{name}.bin", "ab") as f:
+            f.write(np.zeros(7, dtype=dtype).tobytes())
+    with open(tmp_path / INDEX_FILE, "ab") as f:
+        f.write(b"\0" * 13)
+
+    writer = TickWriter(str(tmp_path))
+    write_game(writer, "202", 2, 2000.0)
+    writer.flush()
+    store = TickStore(str(tmp_path))
+    assert len(store) == 5
+    assert store.game(202)["ts"].tolist() == [2000.0, 2001.0]
+    assert os.path.getsize(tmp_path / "ts.bin") == 5 * 8
+
+
+def _append_from_process(path, worker):
+    writer = TickWriter(path, flush_rows=7)
+    for i in range(500):
+        event_id = worker * 100 + i % 3
+        writer.append(event_id, 2, 5, i % 60, i, i, 0.1, 0.1, 0.2, ts=worker * 1e6 + i)
+    writer.close()
+
+
+def test_concurrent_processes_share_one_store(tmp_path):
+    workers = [multiprocessing.Process(target=_append_from_process, args=(str(tmp_path), w)) for w in range(4)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+        assert process.exitcode == 0
+
+    store = TickStore(str(tmp_path))
+    assert len(store) == 4 * 500
+    assert len(store.events()) == 12
+    for event_id in store.events().tolist():
+        game = store.game(event_id)
+        assert (game["event"] == event_id).all()        # no chunk overlaps another
+        assert np.all(np.diff(game["ts"]) > 0)
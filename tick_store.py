@@ -0,0 +1,213 @@
+"""Append-only columnar store of sampled ticks, read back through memory maps
+
+A store is a directory with one raw little-endian file per column plus
+index.bin. Rows are buffered per game and written as contiguous chunks,
+and each chunk gets an index record (event id, row range, time range)
+once its rows are on disk. A reader therefore never sees a half-written
+chunk. Within a chunk rows are in time order, so one game's rows, or the
+part of a chunk inside a time range, are plain slices of the mapped
+columns.
+
+Every gunicorn worker has its own writer on the same directory, so a
+chunk is written under an exclusive flock on the store's lock file and
+the row and record counts are re-read from index.bin each time.
+"""
+import atexit
+import fcntl
+import logging
+import os
+import sys
+import threading
+import time
+from array import array
+
+logger = logging.getLogger(__name__)
+
+# (name, numpy dtype, array typecode)
+COLUMNS = (
+    ("ts", "<f8", "d"),          # wall time, epoch seconds
+    ("event", "<i8", "q"),       # b365 event id
+    ("quarter", "<i1", "b"),
+    ("clock", "<i2", "h"),       # seconds left in the quarter
+    ("home", "<i2", "h"),
+    ("away", "<i2", "h"),
+    ("home_pps", "<f8", "d"),
+    ("away_pps", "<f8", "d"),
+    ("total_pps", "<f8", "d"),
+)
+INDEX_DTYPE = [("event", "<i8"), ("start", "<i8"), ("stop", "<i8"), ("t_min", "<f8"), ("t_max", "<f8")]
+INDEX_RECORD_SIZE = 40
+INDEX_FILE = "index.bin"
+LOCK_FILE = "lock"
+
+class TickWriter:
+    """Buffers ticks per game and appends them to the store as contiguous chunks
+
+    A game's rows are written when it closes, when flush_rows ticks are
+    buffered in total, or flush_interval seconds after the last write.
+    """
+
+    def __init__(self, path, flush_rows=5000, flush_interval=300.0):
+        self.path = path
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        os.makedirs(path, exist_ok=True)
+        self._buffers = {}   # event id -> one array per column
+        self._buffered = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def append(self, event_id, quarter, minute, second, home, away, home_pps, away_pps, total_pps, ts=None):
+        """Buffer one sampled tick"""
+        row = (time.time() if ts is None else ts, int(event_id), quarter, minute * 60 + second,
+               home, away, home_pps, away_pps, total_pps)
+        with self._lock:
+            columns = self._buffers.get(event_id)
+            if columns is None:
+                columns = self._buffers[event_id] = [array(code) for _, _, code in COLUMNS]
+            for column, value in zip(columns, row):
+                column.append(value)
+            self._buffered += 1
+            if self._buffered >= self.flush_rows or time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush_locked()
+
+    def close_game(self, event_id):
+        """Write a finished game's buffered rows, so it usually ends up as a single chunk"""
+        with self._lock:
+            self._write_chunk(event_id)
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        self.flush()
+
+    def _flush_locked(self):
+        for event_id in list(self._buffers):
+            self._write_chunk(event_id)
+        self._last_flush = time.monotonic()
+
+    def _write_chunk(self, event_id):
+        columns = self._buffers.pop(event_id, None)
+        if not columns:
+            return
+        count = len(columns[0])
+        self._buffered -= count
+        try:
+            with open(os.path.join(self.path, LOCK_FILE), "ab") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)   # released when the file closes
+                entries, rows = self._read_tail()   # other processes may have appended since
+                for (name, _, _), column in zip(COLUMNS, columns):
+                    with open(os.path.join(self.path, f"{name}.bin"), "ab") as f:
+                        f.seek(rows * column.itemsize)   # drop any tail left by a crash mid-chunk
+                        f.truncate()
+                        f.write(_little_endian(column))
+                ts = columns[0]
+                record = array("q", (int(event_id), rows, rows + count))
+                bounds = array("d", (min(ts), max(ts)))
+                with open(os.path.join(self.path, INDEX_FILE), "ab") as f:
+                    f.seek(entries * INDEX_RECORD_SIZE)
+                    f.truncate()
+                    f.write(_little_endian(record) + _little_endian(bounds))
+        except Exception as e:
+            logger.error(f"Tick store write error for game {event_id}: {e}")
+
+    def _read_tail(self):
+        """(index records, rows they cover); anything past that is an unfinished chunk"""
+        try:
+            size = os.path.getsize(os.path.join(self.path, INDEX_FILE))
+        except FileNotFoundError:
+            return 0, 0
+        entries = size // INDEX_RECORD_SIZE
+        if not entries:
+            return 0, 0
+        with open(os.path.join(self.path, INDEX_FILE), "rb") as f:
+            f.seek((entries - 1) * INDEX_RECORD_SIZE + 16)   # stop of the last record
+            last = array("q", f.read(8))
+        if sys.byteorder != "little":
+            last.byteswap()
+        return entries, last[0]
+
+def _little_endian(values):
+    if sys.byteorder == "little":
+        return values.tobytes()
+    swapped = array(values.typecode, values)
+    swapped.byteswap()
+    return swapped.tobytes()
+
+class TickStore:
+    """Read-only, memory-mapped view of a tick store directory"""
+
+    def __init__(self, path):
+        import numpy as np
+
+        self.path = path
+        index_path = os.path.join(path, INDEX_FILE)
+        size = os.path.getsize(index_path) if os.path.exists(index_path) else 0
+        entries = size // INDEX_RECORD_SIZE
+        self.index = (np.memmap(index_path, dtype=INDEX_DTYPE, mode="r", shape=(entries,))
+                      if entries else np.zeros(0, dtype=INDEX_DTYPE))
+        rows = int(self.index["stop"][-1]) if len(self.index) else 0
+        self.columns = {}
+        for name, dtype, _ in COLUMNS:
+            if rows:
+                self.columns[name] = np.memmap(os.path.join(path, f"{name}.bin"), dtype=dtype, mode="r", shape=(rows,))
+            else:
+                self.columns[name] = np.zeros(0, dtype=dtype)
+        # Chunks grouped by event id, in write order within each game
+        self._order = np.argsort(self.index["event"], kind="stable")
+        self._events = self.index["event"][self._order]
+
+    def __len__(self):
+        return len(self.columns["ts"])
+
+    def events(self):
+        """Distinct event ids in the store"""
+        import numpy as np
+
+        return np.unique(self._events)
+
+    def chunks(self, event_id):
+        """Index records of one game's chunks, in write order"""
+        import numpy as np
+
+        lo = int(np.searchsorted(self._events, int(event_id), side="left"))
+        hi = int(np.searchsorted(self._events, int(event_id), side="right"))
+        return self.index[self._order[lo:hi]]
+
+    def game(self, event_id):
+        """{column: array} of one game's ticks; zero-copy views when the game is one chunk"""
+        return self._gather(self.chunks(event_id))
+
+    def time_range(self, start, end, event_id=None):
+        """{column: array} of ticks with start <= ts < end, optionally for one game only
+
+        Chunks are located from the index, then cut with searchsorted on
+        their (time-ordered) ts column. A range that falls inside a single
+        chunk comes back as zero-copy views.
+        """
+        chunks = self.index if event_id is None else self.chunks(event_id)
+        chunks = chunks[(chunks["t_min"] < end) & (chunks["t_max"] >= start)]
+        ts = self.columns["ts"]
+        pieces = []
+        for chunk in chunks:
+            lo, hi = int(chunk["start"]), int(chunk["stop"])
+            pieces.append((lo + int(ts[lo:hi].searchsorted(start, side="left")),
+                           lo + int(ts[lo:hi].searchsorted(end, side="left"))))
+        return self._slices(pieces)
+
+    def _gather(self, chunks):
+        return self._slices([(int(chunk["start"]), int(chunk["stop"])) for chunk in chunks])
+
+    def _slices(self, pieces):
+        import numpy as np
+
+        pieces = [(lo, hi) for lo, hi in pieces if hi > lo]
+        if len(pieces) == 1:
+            lo, hi = pieces[0]
+            return {name: column[lo:hi] for name, column in self.columns.items()}
+        if not pieces:
+            return {name: column[:0] for name, column in self.columns.items()}
+        return {name: np.concatenate([column[lo:hi] for lo, hi in pieces]) for name, column in self.columns.items()}
@@ -1,10 +1,10 @@
 """Utility functions"""
-import pytz
 from datetime import datetime
 from config import TIMEZONE
 
 def get_current_time():
     """Get current time in configured timezone"""
+    import pytz
     tz = pytz.timezone(TIMEZONE)
     return datetime.now(tz)
 